@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Compare single-join clipboard assembly against the legacy ``+=`` loop.
+
+Usage:
+    python benchmarks/bench_assembly.py [--files 10000] [--size 200]
+
+Builds the payload for many small files, with headers and Discord
+attachment wrapping enabled, using the current
+``copy_file_contents_to_clipboard`` (clipboard write stubbed out) and the
+pre-builder implementation below, and checks that both produce the same text.
+
+CPython can often extend a ``+=`` string in place, so the legacy build time
+is usually close to linear; the quadratic cost was mostly the debug output,
+which re-printed the whole accumulated buffer after every file. The script
+therefore also reports how many characters ``--debug`` writes either way.
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+
+
+def legacy_assemble(file_contents_list, include_header, discord_attachment, file_paths):
+    combined_contents = ""
+    for i, file_contents in enumerate(file_contents_list):
+        if include_header and file_paths:
+            file_contents = f"=== File: {file_paths[i]} ===\n{file_contents}"
+        if discord_attachment and file_paths:
+            file_contents = (
+                f"[Attached file: {file_paths[i]}\nContent:\n```\n{file_contents}\n```\n]"
+            )
+        combined_contents += file_contents + "\n"
+    return combined_contents
+
+
+def _debug_output_chars(func, *args, **kwargs):
+    written = 0
+
+    def count(*values, **_):
+        nonlocal written
+        written += sum(len(str(value)) for value in values)
+
+    original = core.print if hasattr(core, "print") else None
+    core.print = count
+    try:
+        func(*args, **kwargs)
+    finally:
+        if original is None:
+            del core.print
+        else:
+            core.print = original
+    return written
+
+
+def legacy_debug_chars(file_contents_list):
+    total = 0
+    accumulated = 0
+    for file_contents in file_contents_list:
+        accumulated += len(file_contents) + 1
+        total += accumulated
+    return total + accumulated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--size", type=int, default=200, help="characters per file")
+    args = parser.parse_args()
+
+    contents = [f"{i:08d} " + "x" * args.size for i in range(args.files)]
+    paths = [f"src/module_{i}.py" for i in range(args.files)]
+    core.copy_text_to_clipboard = lambda text, backend=None: None
+
+    start = time.perf_counter()
+    expected = legacy_assemble(contents, True, True, paths)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = core.copy_file_contents_to_clipboard(
+        contents, include_header=True, discord_attachment=True, file_paths=paths
+    )
+    current = time.perf_counter() - start
+
+    assert result == expected, "outputs differ"
+    print(f"{args.files} files, {len(result) / 1e6:.1f} MB payload")
+    print(f"  legacy +=   {legacy * 1000:8.1f} ms")
+    print(f"  join once   {current * 1000:8.1f} ms")
+
+    legacy_debug = legacy_debug_chars(contents)
+    current_debug = _debug_output_chars(
+        core.copy_file_contents_to_clipboard, contents, debug=True
+    )
+    print("debug output (plain contents)")
+    print(f"  legacy      {legacy_debug / 1e6:8.1f} M chars")
+    print(f"  per-file    {current_debug / 1e6:8.1f} M chars")
+
+
+if __name__ == "__main__":
+    main()
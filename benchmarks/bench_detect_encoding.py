@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Compare sampled encoding detection against whole-buffer detection.
+
+Usage:
+    python benchmarks/bench_detect_encoding.py [--size-mb 200]
+
+The legacy implementation below is the pre-sampling ``detect_encoding``:
+chardet over the whole buffer, then a full ``decode`` per fallback encoding.
+Note that chardet 7+ caps the input it inspects internally, so the legacy
+numbers only show the whole-buffer cost with older chardet releases or with
+``--no-chardet``.
+"""
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer.core import detect_encoding
+
+
+def legacy_detect_encoding(data):
+    if data[:2] in (b"\xff\xfe", b"\xfe\xff") or data[:3] == b"\xef\xbb\xbf":
+        return "bom", True
+    try:
+        import chardet
+
+        result = chardet.detect(data)
+        if result and result.get("encoding") and result.get("confidence", 0) > 0.7:
+            return result["encoding"], False
+    except ImportError:
+        pass
+    for encoding in ("utf-8", "utf-16-le", "utf-16-be", "utf-16", "latin-1"):
+        try:
+            data.decode(encoding)
+            return encoding, False
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None, False
+
+
+def _make_inputs(size):
+    line = b"2025-01-05 12:00:00 INFO worker-3 request handled in 12ms path=/api/v1\n"
+    ascii_log = line * (size // len(line))
+    utf8_line = "2025-01-05 12:00:00 INFO café résumé ☃ ok\n".encode()
+    utf8_log = utf8_line * (size // len(utf8_line))
+    latin1_log = ascii_log[:-2] + b"\xe9\n"
+    return {
+        "ascii": ascii_log,
+        "utf-8": utf8_log,
+        "latin-1 tail": latin1_log,
+    }
+
+
+def _time(func, data):
+    start = time.perf_counter()
+    result = func(data)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Only time the current implementation (legacy chardet runs are slow)",
+    )
+    parser.add_argument(
+        "--no-chardet",
+        action="store_true",
+        help="Benchmark both implementations as if chardet were not installed",
+    )
+    args = parser.parse_args()
+    if args.no_chardet:
+        sys.modules["chardet"] = None
+
+    for name, data in _make_inputs(args.size_mb * 1024 * 1024).items():
+        new_time, new_result = _time(detect_encoding, data)
+        line = f"{name:>14}: sampled {new_time:8.3f}s {new_result}"
+        if not args.skip_legacy:
+            old_time, old_result = _time(legacy_detect_encoding, data)
+            line += f" | legacy {old_time:8.3f}s {old_result}"
+            if new_time:
+                line += f" | x{old_time / new_time:.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Compare gitignore-aware discovery against ``git ls-files``.
+
+Usage:
+    python benchmarks/bench_ignore.py [--packages 200] [--files 50]
+
+Creates a temporary git repository with nested ``.gitignore`` files (build
+output, logs, negations), an ``info/exclude`` entry and a large ignored
+``node_modules`` tree, then times ``discover_files`` against
+``git ls-files --others --exclude-standard`` and checks both list the same
+files. The files are then staged and the walk is timed against ``--git``
+discovery, which lists them from the index.
+"""
+
+import argparse
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer.main import discover_files
+
+
+def _build_tree(root, packages, files):
+    subprocess.run(["git", "init", "-q", str(root)], check=True)
+    (root / ".git" / "info" / "exclude").write_text("*.swp\n")
+    (root / ".gitignore").write_text("node_modules/\n*.log\nbuild/\n")
+    for p in range(packages):
+        package = root / "packages" / f"pkg{p}"
+        (package / "src").mkdir(parents=True)
+        (package / "build").mkdir()
+        (package / ".gitignore").write_text("*.generated.ts\n!keep.log\n")
+        for f in range(files):
+            (package / "src" / f"mod{f}.ts").write_text("export {}\n")
+            (package / "src" / f"mod{f}.generated.ts").write_text("export {}\n")
+            (package / "build" / f"mod{f}.js").write_text("")
+        (package / "keep.log").write_text("")
+        (package / "debug.log").write_text("")
+        (package / ".mod0.ts.swp").write_text("")
+        modules = root / "node_modules" / f"dep{p}"
+        modules.mkdir(parents=True)
+        for f in range(files):
+            (modules / f"index{f}.js").write_text("")
+
+
+def _best_of(func, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _git_untracked(root):
+    output = subprocess.run(
+        ["git", "ls-files", "-z", "--others", "--exclude-standard"],
+        cwd=root,
+        capture_output=True,
+        check=True,
+    ).stdout
+    return sorted(path.decode() for path in output.split(b"\0") if path)
+
+
+def _discover(root, use_git=False):
+    text, images, _, _ = discover_files(
+        ["."], False, True, True, base_dir=root, use_git=use_git
+    )
+    return sorted(entry.display_path for entry in text + images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        _build_tree(root, args.packages, args.files)
+        git_time, expected = _best_of(lambda: _git_untracked(root))
+        walk_time, found = _best_of(lambda: _discover(root))
+        subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+        index_time, indexed = _best_of(lambda: _discover(root, use_git=True))
+
+    if found != expected:
+        missing = sorted(set(expected) - set(found))[:5]
+        extra = sorted(set(found) - set(expected))[:5]
+        sys.exit(f"mismatch: missing {missing}, extra {extra}")
+
+    total = args.packages * args.files * 4
+    print(f"{len(found)} files kept out of ~{total}")
+    print(f"  git ls-files      {git_time * 1000:8.1f} ms")
+    print(f"  discover_files    {walk_time * 1000:8.1f} ms")
+    print(f"  discover --git    {index_time * 1000:8.1f} ms (after git add)")
+    if indexed != found:
+        sys.exit("--git listing differs from the walk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Time the work copy_image_to_clipboard does before handing bytes to the tool.
+
+Usage:
+    python benchmarks/bench_images.py [--count 5] [--size 2560x1440] [--corpus DIR]
+
+Generates screenshot-like images (flat UI panels, text-like noise, a photo
+gradient), or uses the PNG and JPEG files in ``--corpus``, and compares:
+
+- PNG sources: the old decode + re-encode at Pillow's default level 6 against
+  the pass-through fast path, which hands the open file to the tool.
+- Other sources: PNG conversion at level 6 against ``PNG_COMPRESS_LEVEL``.
+
+The clipboard tool is replaced by a function that drains its input.
+"""
+
+import argparse
+import io
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+
+
+def _screenshot(width, height, seed):
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (246, 246, 248))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        colour = tuple(rng.randrange(180, 256) for _ in range(3))
+        draw.rectangle([x, y, x + rng.randrange(80, 600), y + rng.randrange(20, 300)], fill=colour)
+    for row in range(0, height, 18):
+        x = rng.randrange(0, 200)
+        while x < width - 40 and rng.random() < 0.97:
+            length = rng.randrange(2, 9) * 7
+            draw.rectangle([x, row + 4, x + length, row + 13], fill=(40, 40, 48))
+            x += length + 7
+    # A photo-like corner that doesn't compress well.
+    photo = Image.effect_noise((width // 3, height // 3), 40).convert("RGB")
+    img.paste(photo, (width - photo.width, height - photo.height))
+    return img
+
+
+def _best_of(func, runs=3):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _drain_run(cmd, input=None, stdin=None, check=None):
+    if stdin is not None:
+        while stdin.read(1024 * 1024):
+            pass
+
+
+def _legacy_copy(path):
+    img = Image.open(path)
+    with io.BytesIO() as output:
+        img.save(output, format="PNG")
+        _drain_run(None, input=output.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--size", default="2560x1440")
+    parser.add_argument("--corpus", type=Path)
+    args = parser.parse_args()
+    width, height = (int(part) for part in args.size.split("x"))
+
+    core.get_clipboard_backend = lambda: core.ClipboardBackend("wl-copy", "/usr/bin/wl-copy")
+    core.subprocess.run = _drain_run
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(
+                path for path in args.corpus.iterdir()
+                if path.suffix.lower() in (".png", ".jpg", ".jpeg")
+            )
+        else:
+            paths = []
+            for index in range(args.count):
+                img = _screenshot(width, height, index)
+                for suffix, options in ((".png", {}), (".jpg", {"quality": 90})):
+                    path = Path(tmp) / f"shot{index}{suffix}"
+                    img.save(path, **options)
+                    paths.append(path)
+
+        totals = {}
+        for path in paths:
+            kind = "png" if path.suffix.lower() == ".png" else "jpeg"
+            old = _best_of(lambda: _legacy_copy(path))
+            new = _best_of(lambda: core.copy_image_to_clipboard(str(path)))
+            slot = totals.setdefault(kind, [0, 0.0, 0.0])
+            slot[0] += 1
+            slot[1] += old
+            slot[2] += new
+
+    for kind, (count, old, new) in sorted(totals.items()):
+        label = "pass-through" if kind == "png" else f"level {core.PNG_COMPRESS_LEVEL}"
+        print(f"{count} {kind.upper()} images")
+        print(f"  decode + PNG level 6  {old * 1000 / count:8.1f} ms/image")
+        print(f"  {label:<20}  {new * 1000 / count:8.1f} ms/image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Measure how long importing the cb CLI takes, using ``-X importtime``.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--max-ms 40]
+
+Reports the median cumulative import time of ``copybuffer.main`` (modules
+already loaded by interpreter startup are not included) and the slowest
+imports it pulls in. With
+``--max-ms`` the script exits non-zero when the median exceeds the budget,
+so it can be used as a regression check.
+"""
+
+import argparse
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _import_tree(statement):
+    """Return [(depth, name, cumulative_us)] for the imports below ``statement``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+
+def _subtree(entries, root):
+    """Return the root entry and its descendants (importtime lists children first)."""
+    for index in range(len(entries) - 1, -1, -1):
+        depth, name, _ = entries[index]
+        if depth == 0 and name == root:
+            break
+    else:
+        raise SystemExit(f"{root} not found in -X importtime output")
+    start = index
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    return entries[index], entries[start:index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = []
+    children = []
+    for _ in range(args.runs):
+        root, children = _subtree(
+            _import_tree("import copybuffer.main"), "copybuffer.main"
+        )
+        samples.append(root[2] / 1000)
+
+    median = statistics.median(samples)
+    print(f"copybuffer.main import: median {median:.1f} ms over {args.runs} runs")
+    print("Slowest third-party/stdlib imports pulled in by copybuffer:")
+    external = [entry for entry in children if not entry[1].startswith("copybuffer")]
+    top_depth = min((depth for depth, _, _ in external), default=0)
+    direct = [(us, name) for depth, name, us in external if depth == top_depth]
+    for us, name in sorted(direct, reverse=True)[:8]:
+        print(f"  {us / 1000:7.2f} ms  {name}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds {args.max_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
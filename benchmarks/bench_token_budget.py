@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare --token-budget packing against counting every file first.
+
+Usage:
+    python benchmarks/bench_token_budget.py [--files 2000] [--budget 100000]
+
+Builds a temporary tree of source-like files, then times
+``pack_token_budget`` (size estimates, exact counts only for files that
+could fit) against reading and tokenizing every file and then selecting by
+exact counts. Needs the cl100k_base vocabulary, which tiktoken downloads on
+first use.
+"""
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer.core import count_tokens_batch
+from copybuffer.main import discover_files, pack_token_budget, read_entries
+
+LINES = [
+    "def handler(request, *args, **kwargs):\n",
+    "    return {'status': 'ok', 'items': [item.to_dict() for item in items]}\n",
+    "# TODO: move the retry policy into the client configuration\n",
+    "    if not isinstance(value, (int, float)):\n",
+    "        raise ValueError(f\"unexpected value {value!r}\")\n",
+    "\n",
+]
+
+
+def _build_tree(root, files):
+    rng = random.Random(42)
+    for i in range(files):
+        package = root / f"pkg{i % 25}" / f"sub{i % 7}"
+        package.mkdir(parents=True, exist_ok=True)
+        lines = rng.randint(20, 400)
+        (package / f"module{i}.py").write_text("".join(rng.choice(LINES) for _ in range(lines)))
+
+
+def count_everything(entries, budget):
+    records = list(read_entries(entries))
+    counts = count_tokens_batch([record.content for record in records])
+    total, kept = 0, []
+    for record, tokens in zip(records, counts):
+        if total + tokens <= budget:
+            total += tokens
+            kept.append(record)
+    return total, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2_000)
+    parser.add_argument("--budget", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        _build_tree(root, args.files)
+        entries, _, _, _ = discover_files(["."], False, True, False, base_dir=root)
+        count_tokens_batch(["warm up the tokenizer"])
+
+        start = time.perf_counter()
+        full_tokens, full_kept = count_everything(entries, args.budget)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        packed = pack_token_budget(entries, args.budget)
+        packed_time = time.perf_counter() - start
+
+    print(f"{len(entries)} files, budget {args.budget:,} tokens")
+    print(
+        f"  count every file  {full_time * 1000:8.1f} ms"
+        f"  ({len(entries)} tokenized, {len(full_kept)} kept, {full_tokens:,} tokens)"
+    )
+    print(
+        f"  pack_token_budget {packed_time * 1000:8.1f} ms"
+        f"  ({packed.counted} tokenized, {len(packed.records)} kept, {packed.tokens:,} tokens)"
+    )
+
+
+if __name__ == "__main__":
+    main()
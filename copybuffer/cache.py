@@ -0,0 +1,226 @@
+"""Persistent cache of per-file text statistics and token counts.
+
+Entries are keyed by path and validated against a stat fingerprint
+``(mtime_ns, size, inode)``, so an unchanged file never has to be
+tokenized again. The cache is best effort: any error opening or writing it
+simply disables caching for the run.
+
+:class:`RunSnapshot` keeps the fingerprints of the files seen by a previous
+run, so ``--since-last`` can tell which files changed without reading them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from .core import default_cache_dir
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+Fingerprint = Tuple[int, int, int]
+
+
+def file_fingerprint(stat_result: os.stat_result) -> Fingerprint:
+    """Return the ``(mtime_ns, size, inode)`` fingerprint for a stat result."""
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+class StatsCache:
+    """SQLite-backed cache of file statistics with LRU eviction.
+
+    Lookups only read the database. New rows and ``last_used`` updates are
+    kept in memory and written in one short transaction by :meth:`close`,
+    so a long run never holds the database lock while it tokenizes.
+
+    Args:
+        path: Database file; defaults to ``stats.sqlite3`` in
+            :func:`default_cache_dir`.
+        max_entries: Number of rows kept after :meth:`close`; the least
+            recently used rows beyond this are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str, None] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = Path(path) if path else default_cache_dir() / "stats.sqlite3"
+        self.max_entries = max_entries
+        self._conn = None
+        self._disabled = False
+        self._pending: Dict[str, tuple] = {}
+        self._touched: Dict[str, float] = {}
+
+    def _connect(self):
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=1.0)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY,"
+                " mtime_ns INTEGER NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " tokenizer TEXT NOT NULL,"
+                " text_stats TEXT NOT NULL,"
+                " token_count INTEGER,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)"
+            )
+            conn.commit()
+        except (OSError, sqlite3.Error):
+            self._disabled = True
+            return None
+        self._conn = conn
+        return conn
+
+    def get(
+        self, file_path: Union[Path, str], fingerprint: Fingerprint, tokenizer: str
+    ) -> Optional[Dict]:
+        """Return the cached record for a file, or None on a miss.
+
+        A row only counts as a hit if its fingerprint and tokenizer match.
+        The returned dict has ``text_stats`` and ``token_count``.
+        """
+        conn = self._connect()
+        if conn is None:
+            return None
+        key = str(file_path)
+        pending = self._pending.get(key)
+        if pending is not None:
+            row = pending[5:] if pending[1:5] == (*fingerprint, tokenizer) else None
+        else:
+            try:
+                row = conn.execute(
+                    "SELECT text_stats, token_count FROM files"
+                    " WHERE path = ? AND mtime_ns = ? AND size = ? AND inode = ?"
+                    " AND tokenizer = ?",
+                    (key, *fingerprint, tokenizer),
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+        if row is None:
+            return None
+        self._touched[key] = time.time()
+        return {"text_stats": json.loads(row[0]), "token_count": row[1]}
+
+    def put(
+        self,
+        file_path: Union[Path, str],
+        fingerprint: Fingerprint,
+        tokenizer: str,
+        text_stats: Dict,
+        token_count: Optional[int],
+    ) -> None:
+        """Store (or replace) the record for a file when the cache is closed."""
+        if self._connect() is None:
+            return
+        key = str(file_path)
+        self._pending[key] = (key, *fingerprint, tokenizer, json.dumps(text_stats), token_count)
+        self._touched[key] = time.time()
+
+    def close(self) -> None:
+        """Write pending rows, evict least recently used rows beyond ``max_entries``."""
+        conn, self._conn = self._conn, None
+        pending, self._pending = self._pending, {}
+        touched, self._touched = self._touched, {}
+        if conn is None:
+            return
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files"
+                " (path, mtime_ns, size, inode, tokenizer, text_stats, token_count, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*row, touched.pop(row[0])) for row in pending.values()],
+            )
+            conn.executemany(
+                "UPDATE files SET last_used = ? WHERE path = ?",
+                [(last_used, key) for key, last_used in touched.items()],
+            )
+            conn.execute(
+                "DELETE FROM files WHERE path IN ("
+                " SELECT path FROM files ORDER BY last_used DESC"
+                " LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RunSnapshot:
+    """File fingerprints recorded at the end of a run, stored as JSON.
+
+    Snapshots are kept per ``key`` (for example the working directory and
+    arguments of a command) in ``snapshots/`` under the cache directory.
+    Like :class:`StatsCache` it is best effort: an unreadable snapshot
+    counts as empty and a failed save is ignored.
+
+    Args:
+        key: Identifies the kind of run the snapshot belongs to.
+        directory: Where snapshots are stored; defaults to ``snapshots`` in
+            :func:`default_cache_dir`.
+    """
+
+    def __init__(self, key: str, directory: Union[Path, str, None] = None):
+        directory = Path(directory) if directory else default_cache_dir() / "snapshots"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        self.path = directory / f"{digest}.json"
+        self._previous: Optional[Dict[str, list]] = None
+
+    def previous(self) -> Dict[str, list]:
+        """Return the fingerprints from the last saved run, keyed by path."""
+        if self._previous is None:
+            try:
+                with open(self.path, encoding="utf-8") as handle:
+                    data = json.load(handle)
+                self._previous = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._previous = {}
+        return self._previous
+
+    def is_changed(self, file_path: Union[Path, str], fingerprint: Fingerprint) -> bool:
+        """Return True if the file is new or its fingerprint differs."""
+        return self.previous().get(str(file_path)) != list(fingerprint)
+
+    def save(self, fingerprints: Iterable[Tuple[Union[Path, str], Fingerprint]]) -> None:
+        """Replace the snapshot with the given ``(path, fingerprint)`` pairs."""
+        data = {str(path): list(fingerprint) for path, fingerprint in fingerprints}
+        temporary = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary, "w", encoding="utf-8") as handle:
+                json.dump(data, handle)
+            os.replace(temporary, self.path)
+        except OSError:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+            return
+        self._previous = data
+
+
+__all__ = [
+    "DEFAULT_MAX_ENTRIES",
+    "RunSnapshot",
+    "StatsCache",
+    "default_cache_dir",
+    "file_fingerprint",
+]
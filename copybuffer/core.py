@@ -1,27 +1,87 @@
+import codecs
+import functools
 import importlib.util
 import io
+import math
 import mimetypes
+import mmap
 import os
+import re
 import shutil
+import struct
 import subprocess
 import sys
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Iterable, Iterator, Tuple, Union
 
-from PIL import Image
 import pyperclip
 
 __VERSION__ = "1.9.1"
 
 
+ENCODING_SAMPLE_SIZE = 64 * 1024
+_VALIDATE_CHUNK_SIZE = 1024 * 1024
+
+
+def _decodes_cleanly(data, encoding: str, final: bool = True) -> bool:
+    """Check whether data decodes with encoding without building the full text.
+
+    The data is fed to an incremental decoder in bounded chunks, so validating
+    a large buffer only ever materializes one chunk of decoded text.
+
+    Args:
+        data: Bytes-like object to validate
+        encoding: Codec name to validate against
+        final: If False, an incomplete multi-byte sequence at the end is allowed
+
+    Returns:
+        True if the data is valid in the given encoding
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)()
+    except LookupError:
+        return False
+    with memoryview(data) as view:
+        try:
+            for start in range(0, len(view), _VALIDATE_CHUNK_SIZE):
+                decoder.decode(view[start:start + _VALIDATE_CHUNK_SIZE])
+            decoder.decode(b"", final=final)
+        except UnicodeError:
+            return False
+    return True
+
+
+def _chardet_guess(sample: bytes) -> Union[str, None]:
+    """Run chardet's incremental detector over a sample, if chardet is installed."""
+    try:
+        from chardet import UniversalDetector
+    except ImportError:
+        return None
+
+    detector = UniversalDetector()
+    for start in range(0, len(sample), 4096):
+        detector.feed(sample[start:start + 4096])
+        if detector.done:
+            break
+    result = detector.close()
+    if result and result.get('encoding') and result.get('confidence', 0) > 0.7:
+        return result['encoding']
+    return None
+
+
 def detect_encoding(data: bytes) -> Tuple[Union[str, None], bool]:
     """Detect the encoding of byte data.
-    
-    Checks for BOMs first, then tries chardet if available, then falls back to common encodings.
-    
+
+    Checks for BOMs first, then takes a UTF-8 fast path, then runs chardet (if
+    available) over a bounded sample, then falls back to common encodings.
+    Only the first ``ENCODING_SAMPLE_SIZE`` bytes are inspected up front; the
+    whole buffer is only validated (incrementally) to confirm a guess made
+    from the sample.
+
     Args:
         data: Byte data to detect encoding for
-        
+
     Returns:
         Tuple of (encoding_name, has_bom) where has_bom indicates if a BOM was found
     """
@@ -36,30 +96,37 @@ def detect_encoding(data: bytes) -> Tuple[Union[str, None], bool]:
         # UTF-8 BOM: EF BB BF
         if len(data) >= 3 and data[:3] == b'\xef\xbb\xbf':
             return 'utf-8', True
-    
-    # Try chardet if available
-    try:
-        import chardet
-        result = chardet.detect(data)
-        if result and result.get('encoding') and result.get('confidence', 0) > 0.7:
-            encoding = result['encoding']
-            # Normalize encoding names
-            if encoding.lower() in ('utf-16', 'utf16'):
-                # chardet might return 'utf-16' but we need to determine endianness
-                # Try both and see which works
-                try:
-                    data.decode('utf-16-le')
-                    return 'utf-16-le', False
-                except UnicodeDecodeError:
-                    try:
-                        data.decode('utf-16-be')
-                        return 'utf-16-be', False
-                    except UnicodeDecodeError:
-                        return 'utf-16', False
+
+    sample = bytes(data[:ENCODING_SAMPLE_SIZE])
+    is_partial = len(data) > len(sample)
+    rejected = set()
+
+    # Fast path: NUL-free UTF-8 (which includes pure ASCII) is by far the most
+    # common input and needs no statistical detection. NUL bytes usually mean
+    # UTF-16 without a BOM, so leave those to chardet.
+    if b'\x00' not in sample and _decodes_cleanly(sample, 'utf-8', final=not is_partial):
+        if not is_partial:
+            return 'utf-8', False
+        # bytes.isascii() is a cheap whole-buffer check for the commonest case
+        if (isinstance(data, bytes) and data.isascii()) or _decodes_cleanly(data, 'utf-8'):
+            return 'utf-8', False
+        rejected.add('utf-8')
+
+    encoding = _chardet_guess(sample)
+    if encoding:
+        # Normalize encoding names
+        if encoding.lower() in ('utf-16', 'utf16'):
+            # chardet might return 'utf-16' but we need to determine endianness
+            # Try both and see which works
+            for candidate in ('utf-16-le', 'utf-16-be'):
+                if _decodes_cleanly(data, candidate):
+                    return candidate, False
+            return 'utf-16', False
+        # A guess made from the sample alone must hold for the rest of the data
+        if not is_partial or _decodes_cleanly(data, encoding):
             return encoding, False
-    except ImportError:
-        pass
-    
+        rejected.add(encoding.lower())
+
     # Fallback: try common encodings in order
     encodings_to_try = [
         'utf-8',
@@ -68,102 +135,380 @@ def detect_encoding(data: bytes) -> Tuple[Union[str, None], bool]:
         'utf-16',
         'latin-1',
     ]
-    
+
     for encoding in encodings_to_try:
-        try:
-            # Try to decode with this encoding
-            data.decode(encoding)
-            return encoding, False
-        except (UnicodeDecodeError, LookupError):
+        if encoding in rejected:
             continue
-    
+        # latin-1 maps every byte, so it cannot fail
+        if encoding == 'latin-1' or _decodes_cleanly(data, encoding):
+            return encoding, False
+
     return None, False
 
 
-def read_with_encoding(file_path: Union[Path, str]) -> Tuple[str, str]:
+MMAP_THRESHOLD = 1024 * 1024
+_UTF16_ENCODINGS = ('utf-16-le', 'utf-16-be', 'utf-16')
+
+
+def _decode_data(data) -> Tuple[str, str]:
+    """Detect the encoding of bytes-like data and decode it.
+
+    BOM stripping and odd-byte UTF-16 trimming are done by slicing a
+    memoryview, so no copy of the raw data is made before decoding.
+
+    Args:
+        data: bytes, mmap or any other bytes-like object
+
+    Returns:
+        Tuple of (content, encoding_used)
+
+    Raises:
+        UnicodeDecodeError: If the detected encoding cannot decode the data
+    """
+    detected_encoding, has_bom = detect_encoding(data)
+    with memoryview(data) as view:
+        if detected_encoding is None:
+            # Last resort: try utf-8 with errors='replace'
+            return str(view, 'utf-8', 'replace'), 'utf-8'
+
+        # Skip BOM bytes if present (before decoding)
+        start = 0
+        if has_bom:
+            start = 3 if detected_encoding == 'utf-8' else 2
+        end = len(view)
+
+        # Handle truncated UTF-16 data (must be even number of bytes)
+        # Use 'replace' for UTF-16 to handle any remaining truncation issues
+        errors = 'strict'
+        if detected_encoding in _UTF16_ENCODINGS:
+            if (end - start) % 2 != 0:
+                end -= 1
+            errors = 'replace'
+
+        with view[start:end] as payload:
+            return str(payload, detected_encoding, errors), detected_encoding
+
+
+_BOMS = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')
+
+
+def _utf8_continuations(data: bytes, start: int, stop: int) -> int:
+    """Count UTF-8 continuation bytes (at most 3) from ``start`` towards ``stop``."""
+    step = 1 if stop >= start else -1
+    count = 0
+    index = start
+    while count < 3 and index != stop and 0x80 <= data[index] <= 0xBF:
+        count += 1
+        index += step
+    return count
+
+
+def _trim_partial_utf8(data: bytes, cut_start: bool, cut_end: bool) -> bytes:
+    """Drop an incomplete UTF-8 sequence left at the edges of a truncated read."""
+    start, end = 0, len(data)
+    if cut_start:
+        start = _utf8_continuations(data, 0, end)
+    if cut_end and end > start:
+        trailing = _utf8_continuations(data, end - 1, start - 1)
+        lead_index = end - 1 - trailing
+        if lead_index >= start:
+            lead = data[lead_index]
+            if lead >= 0xF0:
+                needed = 4
+            elif lead >= 0xE0:
+                needed = 3
+            elif lead >= 0xC0:
+                needed = 2
+            else:
+                needed = 1
+            if trailing + 1 < needed:
+                end = lead_index
+    if start == 0 and end == len(data):
+        return data
+    return data[start:end]
+
+
+def _read_truncated(handle, size: int, max_bytes: int, tail: bool) -> bytes:
+    """Read the first or last ``max_bytes`` of an open file.
+
+    A tail read keeps the file's BOM, if any, so the encoding can still be
+    detected, and starts at an even offset so UTF-16 stays aligned.
+    """
+    if not tail:
+        return _trim_partial_utf8(handle.read(max_bytes), False, True)
+    head = handle.read(3)
+    bom = b''
+    for candidate in _BOMS:
+        if head.startswith(candidate):
+            bom = candidate
+            break
+    offset = max(size - max_bytes + len(bom), len(bom))
+    offset += offset % 2
+    handle.seek(offset)
+    return bom + _trim_partial_utf8(handle.read(), True, False)
+
+
+def read_with_encoding(
+    file_path: Union[Path, str],
+    mmap_threshold: Union[int, None] = None,
+    max_bytes: Union[int, None] = None,
+    tail: bool = False,
+) -> Tuple[str, str]:
     """Read a file and detect its encoding.
-    
+
+    Files of at least ``mmap_threshold`` bytes are memory-mapped instead of
+    read into a bytes object, so peak memory is roughly the decoded string
+    plus the (page cache backed) mapping.
+
     Args:
         file_path: Path to the file to read
-        
+        mmap_threshold: Size in bytes from which the file is memory-mapped;
+            defaults to ``MMAP_THRESHOLD``
+        max_bytes: Read at most this many bytes; an incomplete UTF-8
+            sequence at the cut is dropped
+        tail: With ``max_bytes``, read the end of the file instead of the start
+
     Returns:
         Tuple of (content, encoding_used)
-        
+
     Raises:
         UnicodeDecodeError: If encoding detection fails and all fallbacks fail
     """
-    path = Path(file_path)
-    data = path.read_bytes()
-    
-    detected_encoding, has_bom = detect_encoding(data)
-    if detected_encoding is None:
-        # Last resort: try utf-8 with errors='replace'
-        return data.decode('utf-8', errors='replace'), 'utf-8'
-    
-    # Strip BOM bytes if present (before decoding)
-    if has_bom:
-        if detected_encoding == 'utf-16-le' and data[:2] == b'\xff\xfe':
-            data = data[2:]
-        elif detected_encoding == 'utf-16-be' and data[:2] == b'\xfe\xff':
-            data = data[2:]
-        elif detected_encoding == 'utf-8' and data[:3] == b'\xef\xbb\xbf':
-            data = data[3:]
-    
-    # Handle truncated UTF-16 data (must be even number of bytes)
-    if detected_encoding in ('utf-16-le', 'utf-16-be', 'utf-16'):
-        if len(data) % 2 != 0:
-            # Truncated UTF-16 data - strip last byte and decode with error handling
-            data = data[:-1]
-    
-    # Decode with detected encoding
-    # Use 'replace' for UTF-16 to handle any remaining truncation issues
-    if detected_encoding in ('utf-16-le', 'utf-16-be', 'utf-16'):
-        content = data.decode(detected_encoding, errors='replace')
-    else:
-        content = data.decode(detected_encoding)
-    
-    return content, detected_encoding
+    if mmap_threshold is None:
+        mmap_threshold = MMAP_THRESHOLD
+
+    with open(file_path, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if max_bytes is not None and size > max_bytes:
+            return _decode_data(_read_truncated(handle, size, max_bytes, tail))
+        if size and size >= mmap_threshold:
+            try:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Not mappable (e.g. special files); use a plain read instead
+                mapped = None
+            if mapped is not None:
+                with mapped:
+                    return _decode_data(mapped)
+        data = handle.read()
+
+    return _decode_data(data)
 
 
 def read_stdin_with_encoding() -> Tuple[str, str]:
     """Read from stdin and detect encoding.
-    
+
     Returns:
         Tuple of (content, encoding_used)
-        
+
     Raises:
         UnicodeDecodeError: If encoding detection fails and all fallbacks fail
     """
-    data = sys.stdin.buffer.read()
-    
-    detected_encoding, has_bom = detect_encoding(data)
-    if detected_encoding is None:
-        # Last resort: try utf-8 with errors='replace'
-        return data.decode('utf-8', errors='replace'), 'utf-8'
-    
-    # Strip BOM bytes if present (before decoding)
-    if has_bom:
-        if detected_encoding == 'utf-16-le' and data[:2] == b'\xff\xfe':
-            data = data[2:]
-        elif detected_encoding == 'utf-16-be' and data[:2] == b'\xfe\xff':
-            data = data[2:]
-        elif detected_encoding == 'utf-8' and data[:3] == b'\xef\xbb\xbf':
-            data = data[3:]
-    
-    # Handle truncated UTF-16 data (must be even number of bytes)
-    if detected_encoding in ('utf-16-le', 'utf-16-be', 'utf-16'):
-        if len(data) % 2 != 0:
-            # Truncated UTF-16 data - strip last byte and decode with error handling
-            data = data[:-1]
-    
-    # Decode with detected encoding
-    # Use 'replace' for UTF-16 to handle any remaining truncation issues
-    if detected_encoding in ('utf-16-le', 'utf-16-be', 'utf-16'):
-        content = data.decode(detected_encoding, errors='replace')
+    return _decode_data(sys.stdin.buffer.read())
+
+
+STDIN_CHUNK_SIZE = 64 * 1024
+
+
+class StdinReader:
+    """Read and decode a binary stream chunk by chunk.
+
+    The encoding is detected from the first chunk and the rest is decoded
+    with an incremental decoder, so memory stays bounded by the chunk size
+    and text is available before the stream ends (``tail -f | cb --stdout``).
+    Chunks are read with ``read1`` when the stream has it, returning whatever
+    is already available instead of waiting for a full chunk. Since later
+    bytes can't change the detected encoding, any that don't decode are
+    replaced with U+FFFD rather than failing half way through.
+
+    Args:
+        stream: Binary stream; defaults to ``sys.stdin.buffer``
+        max_bytes: Stop after this many bytes of input, dropping a character
+            cut in half; ``truncated`` is set if input was left unread
+        chunk_size: Maximum number of bytes per read
+
+    Attributes:
+        encoding: Detected encoding, once iteration has started
+        bytes_read: Number of bytes consumed so far
+        truncated: True if ``max_bytes`` stopped the read early
+    """
+
+    def __init__(self, stream=None, max_bytes=None, chunk_size=STDIN_CHUNK_SIZE):
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.encoding = None
+        self.bytes_read = 0
+        self.truncated = False
+
+    def _read(self) -> bytes:
+        size = self.chunk_size
+        if self.max_bytes is not None:
+            remaining = self.max_bytes - self.bytes_read
+            if remaining <= 0:
+                # One more byte tells a capped stream from one that ended
+                # exactly at the cap.
+                if not self.truncated and self.stream.read(1):
+                    self.truncated = True
+                return b""
+            size = min(size, remaining)
+        read = getattr(self.stream, "read1", self.stream.read)
+        data = read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __iter__(self) -> Iterator[str]:
+        first = self._read()
+        # A BOM takes up to three bytes.
+        while first and len(first) < 4:
+            more = self._read()
+            if not more:
+                break
+            first += more
+
+        sample = first
+        if not first.startswith(_BOMS):
+            # The chunk may end inside a UTF-8 character.
+            sample = _trim_partial_utf8(first, False, True)
+        encoding, has_bom = detect_encoding(sample)
+        if encoding is None:
+            encoding = 'utf-8'
+        start = 0
+        if has_bom:
+            start = 3 if encoding == 'utf-8' else 2
+        self.encoding = encoding
+        decoder = codecs.getincrementaldecoder(encoding)('replace')
+
+        text = decoder.decode(first[start:])
+        while True:
+            if text:
+                yield text
+            data = self._read()
+            if not data:
+                break
+            text = decoder.decode(data)
+        # A character cut by the cap, or a dangling UTF-16 byte (which
+        # _decode_data also drops), is left in the decoder.
+        if not self.truncated and encoding not in _UTF16_ENCODINGS:
+            text = decoder.decode(b'', final=True)
+            if text:
+                yield text
+
+
+def strip_chunks(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the pieces of ``"".join(chunks).strip()`` without joining them.
+
+    Leading whitespace is dropped as it arrives; trailing whitespace of a
+    chunk is held back until more text follows it.
+    """
+    started = False
+    held = []
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        trailing = chunk[len(body):]
+        if body:
+            if held:
+                body = "".join(held) + body
+                held.clear()
+            yield body
+        if trailing:
+            held.append(trailing)
+
+
+SNIFF_SIZE = 8 * 1024
+BINARY_CONTROL_RATIO = 0.1
+
+# Signatures of common binary formats, checked against the start of a file.
+# Signatures made only of printable text are avoided (apart from PDF), since
+# those formats are caught by the NUL check anyway.
+_BINARY_SIGNATURES = (
+    (b"\x7fELF", "ELF binary"),
+    (b"\xca\xfe\xba\xbe", "Mach-O or Java class file"),
+    (b"\xfe\xed\xfa\xce", "Mach-O binary"),
+    (b"\xfe\xed\xfa\xcf", "Mach-O binary"),
+    (b"\xce\xfa\xed\xfe", "Mach-O binary"),
+    (b"\xcf\xfa\xed\xfe", "Mach-O binary"),
+    (b"\x00asm", "WebAssembly module"),
+    (b"PK\x03\x04", "zip archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"\xfd7zXZ\x00", "xz archive"),
+    (b"\x28\xb5\x2f\xfd", "zstd archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7z archive"),
+    (b"Rar!\x1a\x07", "rar archive"),
+    (b"%PDF-", "PDF document"),
+    (b"SQLite format 3\x00", "SQLite database"),
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"\x1aE\xdf\xa3", "Matroska media"),
+    (b"\x93NUMPY", "NumPy array"),
+    (b"\x80\x04\x95", "Python pickle"),
+)
+
+# C0 control bytes that do not occur in ordinary text. Tab, newlines, form
+# feed, backspace and escape (ANSI colour codes in logs) are allowed.
+_CONTROL_BYTES = bytes(
+    byte for byte in range(32) if byte not in b"\t\n\r\f\b\x1b"
+) + b"\x7f"
+
+
+def _looks_like_utf16(sample: bytes) -> bool:
+    """Return True for BOM-less UTF-16 whose NUL bytes sit in one byte lane."""
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    half = len(sample) // 2 or 1
+    if odd_nuls >= half * 0.4 and even_nuls <= half * 0.05:
+        encoding = 'utf-16-le'
+    elif even_nuls >= half * 0.4 and odd_nuls <= half * 0.05:
+        encoding = 'utf-16-be'
     else:
-        content = data.decode(detected_encoding)
-    
-    return content, detected_encoding
+        return False
+    return _decodes_cleanly(sample[:len(sample) - len(sample) % 2], encoding, final=False)
+
+
+def sniff_binary(sample: bytes) -> Union[str, None]:
+    """Decide from the first bytes of a file whether it is binary.
+
+    Checks known file signatures, then NUL bytes (allowing UTF-16 text),
+    then the share of control characters.
+
+    Args:
+        sample: The start of the file, e.g. ``SNIFF_SIZE`` bytes
+
+    Returns:
+        A short reason if the data looks binary, otherwise None
+    """
+    if not sample:
+        return None
+    if sample.startswith((b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')):
+        return None
+    for signature, description in _BINARY_SIGNATURES:
+        if sample.startswith(signature):
+            return description
+    if len(sample) > 262 and sample[257:262] == b"ustar":
+        return "tar archive"
+    if b'\x00' in sample:
+        if _looks_like_utf16(sample):
+            return None
+        return "contains NUL bytes"
+    controls = len(sample) - len(sample.translate(None, _CONTROL_BYTES))
+    if controls > len(sample) * BINARY_CONTROL_RATIO:
+        return "control characters"
+    return None
+
+
+def sniff_file(file_path: Union[Path, str], sample_size: int = SNIFF_SIZE) -> Union[str, None]:
+    """Read the first ``sample_size`` bytes of a file and run :func:`sniff_binary`.
+
+    Raises:
+        OSError: If the file cannot be opened or read
+    """
+    with open(file_path, 'rb') as handle:
+        return sniff_binary(handle.read(sample_size))
 
 
 def is_wayland() -> bool:
@@ -193,28 +538,287 @@ def has_display() -> bool:
 def is_pyperclip_installed():  # pragma: no cover
     return importlib.util.find_spec("pyperclip") is not None
 
-def check_dependencies():
-    missing_dependencies = []
+def default_cache_dir() -> Path:
+    """Return the copybuffer cache directory, honoring ``$XDG_CACHE_HOME``."""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "copybuffer"
 
-    if is_wayland():
-        if not is_wlclipboard_installed():
-            missing_dependencies.append("wl-clipboard (wl-copy and wl-paste)")
+
+@dataclass(frozen=True)
+class ClipboardBackend:
+    """The clipboard mechanism used for both text and image copies.
+
+    Attributes:
+        name: ``"wl-copy"``, ``"xclip"``, ``"xsel"``, ``"pbcopy"``,
+            ``"win32"`` or None when no mechanism is available
+        executable: Resolved path of the command-line tool, if any
+        missing: Human-readable dependencies that are missing
+    """
+
+    name: Union[str, None]
+    executable: Union[str, None] = None
+    missing: Tuple[str, ...] = ()
+
+    def text_command(self):
+        """Return the command that reads UTF-8 text from stdin, if any.
+
+        Windows has no such tool; callers fall back to pyperclip there.
+        """
+        if self.name == "wl-copy":
+            return ["wl-copy"]
+        if self.name == "xclip":
+            return ["xclip", "-selection", "clipboard", "-i"]
+        if self.name == "xsel":
+            return ["xsel", "--clipboard", "--input"]
+        if self.name == "pbcopy":
+            return ["pbcopy"]
+        return None
+
+    def image_command(self, mime_type: str):
+        """Return the command that reads image data of mime_type from stdin."""
+        if self.name == "wl-copy":
+            return ["wl-copy", "--type", mime_type]
+        if self.name == "xclip":
+            return ["xclip", "-selection", "clipboard", "-t", mime_type]
+        if self.name == "xsel":
+            return ["xsel", "--clipboard", "--input", "--mime-type", mime_type]
+        return None
+
+
+_CLIPBOARD_BACKEND = None
+_BACKEND_ENV_VARS = (
+    "PATH",
+    "WAYLAND_DISPLAY",
+    "XDG_SESSION_TYPE",
+    "HYPRLAND_INSTANCE_SIGNATURE",
+    "SWAYSOCK",
+    "DISPLAY",
+)
+
+
+def detect_clipboard_backend() -> ClipboardBackend:
+    """Probe the environment for a clipboard mechanism (uncached)."""
+    wayland = is_wayland()
+    name = None
+    if sys.platform == "darwin":
+        name = "pbcopy"
+    elif sys.platform.startswith("win"):
+        name = "win32"
+    elif wayland and is_wlclipboard_installed():
+        name = "wl-copy"
+    elif is_xclip_installed():
+        name = "xclip"
+    elif is_xsel_installed():
+        name = "xsel"
+
+    missing = []
+    if wayland:
+        if name != "wl-copy":
+            missing.append("wl-clipboard (wl-copy and wl-paste)")
     elif not has_display():
-        missing_dependencies.append("DISPLAY environment variable")
-    elif not is_xclip_installed() and not is_xsel_installed():
-        missing_dependencies.append("xclip or xsel")
+        missing.append("DISPLAY environment variable")
+    elif name not in ("xclip", "xsel"):
+        missing.append("xclip or xsel")
 
     if not is_pyperclip_installed():
-        missing_dependencies.append("pyperclip")
+        missing.append("pyperclip")
+
+    executable = shutil.which(name) if name and name != "win32" else None
+    return ClipboardBackend(name, executable, tuple(missing))
+
+
+def _backend_fingerprint() -> str:
+    import hashlib
+
+    parts = [sys.platform] + [os.environ.get(var, "") for var in _BACKEND_ENV_VARS]
+    return hashlib.sha1("\0".join(parts).encode("utf-8", "replace")).hexdigest()
+
+
+def _load_cached_backend(fingerprint: str) -> Union[ClipboardBackend, None]:
+    import json
+
+    try:
+        data = json.loads((default_cache_dir() / "backend.json").read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("fingerprint") != fingerprint:
+        return None
+    executable = data.get("executable")
+    # One access() call instead of a $PATH scan; catches uninstalled tools.
+    if executable and not os.access(executable, os.X_OK):
+        return None
+    return ClipboardBackend(data.get("name"), executable)
+
+
+def _store_cached_backend(fingerprint: str, backend: ClipboardBackend) -> None:
+    import json
+
+    cache_file = default_cache_dir() / "backend.json"
+    payload = {
+        "fingerprint": fingerprint,
+        "name": backend.name,
+        "executable": backend.executable,
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(payload))
+    except OSError:
+        pass
+
+
+def get_clipboard_backend(refresh: bool = False) -> ClipboardBackend:
+    """Return the clipboard backend, probing at most once per process.
 
-    return missing_dependencies
+    A successful probe is also stored in ``backend.json`` in the cache
+    directory, keyed by a fingerprint of the platform, ``$PATH`` and the
+    display-related environment variables, so later runs in the same
+    environment skip the ``$PATH`` scans entirely. Incomplete setups are never
+    cached, so installing a missing tool takes effect immediately.
+
+    Args:
+        refresh: Ignore both caches and probe again
+
+    Returns:
+        ClipboardBackend for the current environment
+    """
+    global _CLIPBOARD_BACKEND
+    if _CLIPBOARD_BACKEND is not None and not refresh:
+        return _CLIPBOARD_BACKEND
+
+    fingerprint = _backend_fingerprint()
+    backend = None if refresh else _load_cached_backend(fingerprint)
+    if backend is None:
+        backend = detect_clipboard_backend()
+        if backend.name and not backend.missing:
+            _store_cached_backend(fingerprint, backend)
+    _CLIPBOARD_BACKEND = backend
+    return backend
+
+
+def check_dependencies(backend: Union[ClipboardBackend, None] = None):
+    """Return the missing clipboard dependencies.
+
+    Args:
+        backend: Backend to inspect; probes the environment when omitted
+    """
+    if backend is None:
+        backend = detect_clipboard_backend()
+    return list(backend.missing)
 
-def install_dependencies():  # pragma: no cover
+def install_dependencies(dependencies=None):  # pragma: no cover
     print("Please install the following dependencies:")
-    dependencies = check_dependencies()
+    if dependencies is None:
+        dependencies = check_dependencies()
     for dep in dependencies:
         print(f"- {dep}")
 
+_CLIPBOARD_CHUNK_CHARS = 1024 * 1024
+
+
+def _write_text(stream, text: str) -> None:
+    """Encode text to UTF-8 one chunk at a time and write it to a binary stream."""
+    for start in range(0, len(text), _CLIPBOARD_CHUNK_CHARS):
+        stream.write(text[start:start + _CLIPBOARD_CHUNK_CHARS].encode("utf-8", "replace"))
+
+
+def _open_clipboard_process(backend: ClipboardBackend):
+    """Start the backend's text-copy tool with a pipe on stdin, or return None."""
+    command = backend.text_command()
+    if command is None:
+        return None
+    try:
+        # The tools fork to keep serving the selection; detach them from our
+        # stdout/stderr so they don't hold a caller's pipe open.
+        return subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+        )
+    except OSError:
+        return None
+
+
+def copy_text_to_clipboard(text: str, backend: Union[ClipboardBackend, None] = None) -> None:
+    """Copy text to the clipboard.
+
+    The text is streamed, UTF-8 encoded in bounded chunks, straight into the
+    stdin of the backend's tool (``wl-copy``, ``xclip -i``, ``xsel -i`` or
+    ``pbcopy``), so no full-size encoded copy is built in Python. pyperclip is
+    used when there is no such tool or it fails.
+
+    Args:
+        text: Text to copy
+        backend: Clipboard backend; defaults to :func:`get_clipboard_backend`
+
+    Raises:
+        pyperclip.PyperclipException: If no clipboard mechanism works
+    """
+    if backend is None:
+        backend = get_clipboard_backend()
+    process = _open_clipboard_process(backend)
+    if process is not None:
+        try:
+            _write_text(process.stdin, text)
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if process.wait() == 0:
+            return
+    pyperclip.copy(text)
+
+
+def clipboard_unavailable_message() -> str:
+    """Explain why copying to the clipboard failed on this system."""
+    if is_wayland():
+        return "Install 'wl-clipboard' for Wayland clipboard support."
+    if not has_display():
+        return (
+            "No DISPLAY environment variable. Ensure an X server is running or install wl-clipboard for Wayland."
+        )
+    return "No clipboard mechanism found. Install xclip or xsel."
+
+
+def format_file_block(
+    file_contents, file_path=None, include_header=False, discord_attachment=False
+) -> Tuple[str, ...]:
+    """Return the pieces that make up one file's block of copied text.
+
+    Header and Discord wrapping are separate pieces around the contents, so
+    they can be joined or streamed without copying the contents into
+    intermediate strings.
+    """
+    if not file_path:
+        return (file_contents, "\n")
+    header = f"=== File: {file_path} ===\n" if include_header else ""
+    if discord_attachment:
+        return (
+            f"[Attached file: {file_path}\nContent:\n```\n{header}",
+            file_contents,
+            "\n```\n]\n",
+        )
+    return (header, file_contents, "\n")
+
+
+@dataclass(frozen=True)
+class DuplicateOf:
+    """Stands in for the contents of a file identical to an earlier one.
+
+    Output writers emit a short reference to ``path``, the display path of
+    the first copy, instead of the contents again.
+    """
+
+    path: str
+
+
+def format_duplicate_block(file_path, original_path, discord_attachment=False) -> Tuple[str, ...]:
+    """Return the block referring a duplicate file to its first copy."""
+    if discord_attachment:
+        return (f"[Attached file: {file_path}\nSame content as: {original_path}]\n",)
+    return (f"=== File: {file_path} (same content as {original_path}) ===\n",)
+
+
 def copy_file_contents_to_clipboard(
     file_contents_list,
     include_header=False,
@@ -223,125 +827,165 @@ def copy_file_contents_to_clipboard(
     debug=False,
 ):
     try:
-        combined_contents = ""
+        parts = []
         for i, file_contents in enumerate(file_contents_list):
-            if include_header and file_paths:
-                header = f"=== File: {file_paths[i]} ===\n"
-                file_contents = header + file_contents
-
-            if discord_attachment and file_paths:
-                file_contents = (
-                    f"[Attached file: {file_paths[i]}\nContent:\n```\n{file_contents}\n```\n]"
-                )
-
-            combined_contents += file_contents + "\n"
+            file_parts = format_file_block(
+                file_contents,
+                file_paths[i] if file_paths else None,
+                include_header,
+                discord_attachment,
+            )
+            parts += file_parts
             if debug:
-                print(f"Debug: Combined contents so far:\n{combined_contents}")
+                print(f"Debug: Added contents of file {i + 1}:\n{''.join(file_parts)}")
 
-        pyperclip.copy(combined_contents)
+        combined_contents = "".join(parts)
+        del parts
+        copy_text_to_clipboard(combined_contents)
         if debug:
             print(f"Debug: Final combined contents copied to clipboard:\n{combined_contents}")
         return combined_contents
     except pyperclip.PyperclipException:
-        if is_wayland():
-            print("Error: Install 'wl-clipboard' for Wayland clipboard support.")
-        elif not has_display():
-            print(
-                "Error: No DISPLAY environment variable. Ensure an X server is running or install wl-clipboard for Wayland."
-            )
-        else:
-            print("Error: No clipboard mechanism found. Install xclip or xsel.")
+        print(f"Error: {clipboard_unavailable_message()}")
         return None
     except Exception as e:
         print(f"Error: An unexpected error occurred. {str(e)}")
         return None
 
 
-def copy_image_to_clipboard(image_path):
-    """Copy an image file to the system clipboard.
-    
-    For GIF files (animated or static), preserves the original GIF format.
-    For other image formats, converts to PNG.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+#: zlib level for images converted to PNG. Level 1 encodes several times
+#: faster than Pillow's default of 6 for a modestly larger file.
+PNG_COMPRESS_LEVEL = 1
+
+
+#: Attempts at shrinking an encoded PNG further to fit ``max_bytes``.
+IMAGE_FIT_ATTEMPTS = 6
+
+
+def _png_dimensions(header: bytes):
+    """Return ``(width, height)`` from the first 24 bytes of a PNG, or None."""
+    if len(header) < 24 or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _shrink_image(img, max_dim: int):
+    """Scale ``img`` to fit a ``max_dim`` square, keeping its aspect ratio.
+
+    JPEGs are decoded at a reduced scale with ``draft()`` first, and the
+    rest is done by ``thumbnail()`` with the bilinear filter, which is much
+    faster than the default Lanczos for a difference hardly visible on
+    screen.
     """
-    try:
-        img = Image.open(image_path)
-    except FileNotFoundError:
-        print(f"Error: File '{image_path}' not found")
-        return False
-    except Exception as e:
-        print(f"Error: Unable to open image '{image_path}': {e}")
-        return False
+    from PIL import Image
 
-    # Determine image format
-    is_gif = img.format and img.format.upper() == 'GIF'
-    
-    # Convert all images to PNG for clipboard compatibility
-    # Note: GIFs (both animated and static) are converted to PNG for clipboard.
-    # This ensures compatibility with applications like Discord that don't
-    # support image/gif clipboard format on Linux. Animated GIFs will show
-    # only the first frame when pasted. To share animated GIFs, upload the
-    # file directly rather than using clipboard.
+    if max(img.size) <= max_dim:
+        return img
+    if img.format == "JPEG":
+        img.draft(img.mode, (max_dim, max_dim))
+    if img.mode in ("1", "P"):
+        # Palette images would be resized with nearest-neighbour otherwise.
+        img = img.convert("RGBA")
+    img.thumbnail((max_dim, max_dim), Image.Resampling.BILINEAR)
+    return img
+
+
+#: Longest side of the previews encoded to predict a PNG's size.
+IMAGE_PROBE_DIM = 1024
+
+
+def _png_size(img) -> int:
     with io.BytesIO() as output:
-        img.save(output, format="PNG")
-        image_data = output.getvalue()
-    mime_type = "image/png"
+        img.save(output, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+        return output.tell()
+
+
+def _preview(img, max_dim: int):
+    """Return a copy of ``img`` scaled to fit a ``max_dim`` square; ``img`` is kept."""
+    from PIL import Image
+
+    if img.mode in ("1", "P"):
+        img = img.convert("RGBA")
+    scale = max_dim / max(img.size)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def _predict_max_dim(img, max_bytes: int) -> int:
+    """Predict the longest side at which the image's PNG fits in ``max_bytes``.
+
+    Previews at ``IMAGE_PROBE_DIM`` and half that are encoded and the growth
+    of the encoded size with the image side is extrapolated (between linear
+    and cubic; smooth screenshots grow slower than the pixel count, noisy
+    photos faster), so a large image is scaled down before its first
+    full-size encode.
+
+    The previews are made from ``img`` itself, whose decoded pixels are then
+    reused for the final resize. A JPEG is the exception: ``draft()`` can't
+    be undone, so its preview is decoded at reduced scale from a second
+    handle on the file, which costs a fraction of a full decode.
+    """
+    from PIL import Image
+
+    if img.format == "JPEG" and getattr(img, "filename", None):
+        with Image.open(img.filename) as probe:
+            large = _shrink_image(probe, IMAGE_PROBE_DIM)
+            large.load()
+    else:
+        large = _preview(img, IMAGE_PROBE_DIM)
+    small = _preview(large, IMAGE_PROBE_DIM // 2)
+    large_bytes, small_bytes = _png_size(large), _png_size(small)
+    large_dim, small_dim = max(large.size), max(small.size)
+    exponent = 2.0
+    if small_bytes and large_dim > small_dim:
+        exponent = math.log(large_bytes / small_bytes) / math.log(large_dim / small_dim)
+        exponent = min(max(exponent, 1.0), 3.0)
+    predicted = large_dim * (max_bytes / large_bytes) ** (1 / exponent)
+    return max(1, min(max(img.size), int(predicted)))
+
+
+def _encode_png(img, max_bytes=None):
+    """Encode ``img`` as PNG, shrinking it until it fits in ``max_bytes``.
+
+    Returns:
+        The PNG bytes, or None if ``max_bytes`` could not be met.
+    """
+    for _ in range(IMAGE_FIT_ATTEMPTS + 1):
+        with io.BytesIO() as output:
+            img.save(output, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+            image_data = output.getvalue()
+        if max_bytes is None or len(image_data) <= max_bytes:
+            return image_data
+        # Encoded size is roughly proportional to the pixel count.
+        scale = (max_bytes / len(image_data)) ** 0.5 * 0.9
+        max_dim = int(max(img.size) * scale)
+        if max_dim < 1:
+            break
+        img = _shrink_image(img, max_dim)
+    return None
+
 
+def _pipe_image(source, mime_type: str = "image/png") -> bool:
+    """Send PNG bytes, or an open binary file, to the clipboard tool.
+
+    Only used on Linux and macOS; Windows needs a decoded DIB instead.
+    """
+    # A file is handed to the tool as its stdin, so it is never read here.
+    stdin_kwargs = {"input": source} if isinstance(source, bytes) else {"stdin": source}
     try:
         if sys.platform.startswith("linux"):
-            if is_wayland() and shutil.which("wl-copy"):
-                subprocess.run(["wl-copy", "--type", mime_type], input=image_data, check=True)
-            elif shutil.which("xclip"):
-                subprocess.run([
-                    "xclip",
-                    "-selection",
-                    "clipboard",
-                    "-t",
-                    mime_type,
-                ], input=image_data, check=True)
-            elif shutil.which("xsel"):
-                subprocess.run(
-                    ["xsel", "--clipboard", "--input", "--mime-type", mime_type],
-                    input=image_data,
-                    check=True,
-                )
-            else:
+            command = get_clipboard_backend().image_command(mime_type)
+            if command is None:
                 print(
                     "Error: No clipboard mechanism found. Install wl-clipboard, xclip, or xsel."
                 )
                 return False
+            subprocess.run(command, check=True, **stdin_kwargs)
         elif sys.platform == "darwin":
             # macOS pbcopy should handle both PNG and GIF
-            subprocess.run(["pbcopy"], input=image_data, check=True)
-        elif sys.platform.startswith("win"):
-            try:
-                import win32clipboard
-                import win32con
-            except ImportError:
-                print("Error: win32clipboard module is required on Windows.")
-                return False
-
-            if is_gif:
-                # For GIF on Windows, convert to BMP since win32clipboard doesn't
-                # natively support animated GIFs in clipboard
-                # Note: This will convert animated GIFs to static BMP (first frame)
-                bmp = img.convert("RGB")
-                with io.BytesIO() as bmp_buffer:
-                    bmp.save(bmp_buffer, "BMP")
-                    dib_data = bmp_buffer.getvalue()[14:]
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardData(win32con.CF_DIB, dib_data)
-                win32clipboard.CloseClipboard()
-            else:
-                # For non-GIF images, use existing BMP conversion
-                bmp = img.convert("RGB")
-                with io.BytesIO() as bmp_buffer:
-                    bmp.save(bmp_buffer, "BMP")
-                    dib_data = bmp_buffer.getvalue()[14:]
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.SetClipboardData(win32con.CF_DIB, dib_data)
-                win32clipboard.CloseClipboard()
+            subprocess.run(["pbcopy"], check=True, **stdin_kwargs)
         else:
             print("Error: Unsupported platform for image clipboard operations.")
             return False
@@ -350,9 +994,111 @@ def copy_image_to_clipboard(image_path):
         return False
     return True
 
+
+def copy_image_to_clipboard(image_path, max_dim=None, max_bytes=None):
+    """Copy an image file to the system clipboard.
+
+    PNG files within the limits are passed to the clipboard tool unchanged,
+    without decoding them. Other images (including GIF, first frame only)
+    are converted to PNG with ``PNG_COMPRESS_LEVEL``; Windows always gets a
+    decoded bitmap.
+
+    Args:
+        image_path: Path of the image file
+        max_dim: Scale the image down so neither side exceeds this many pixels
+        max_bytes: Scale the PNG down further until it is at most this size;
+            not applied on Windows
+
+    Returns:
+        bool: True if the image was copied
+    """
+    if not sys.platform.startswith("win"):
+        try:
+            # Unbuffered, so seek(0) rewinds the descriptor the tool reads from.
+            with open(image_path, "rb", buffering=0) as handle:
+                header = handle.read(24)
+                dimensions = _png_dimensions(header)
+                if (
+                    header.startswith(PNG_SIGNATURE)
+                    and dimensions is not None
+                    and (max_dim is None or max(dimensions) <= max_dim)
+                    and (max_bytes is None or os.fstat(handle.fileno()).st_size <= max_bytes)
+                ):
+                    handle.seek(0)
+                    return _pipe_image(handle)
+        except FileNotFoundError:
+            print(f"Error: File '{image_path}' not found")
+            return False
+        except OSError:
+            # Let Pillow report the problem below.
+            pass
+
+    # Pillow is only needed for images; importing it lazily keeps text runs fast.
+    from PIL import Image
+
+    try:
+        img = Image.open(image_path)
+        if (
+            max_bytes is not None
+            and not sys.platform.startswith("win")
+            and max(img.size) > IMAGE_PROBE_DIM
+        ):
+            predicted = _predict_max_dim(img, max_bytes)
+            max_dim = predicted if max_dim is None else min(max_dim, predicted)
+        if max_dim is not None:
+            img = _shrink_image(img, max_dim)
+    except FileNotFoundError:
+        print(f"Error: File '{image_path}' not found")
+        return False
+    except Exception as e:
+        print(f"Error: Unable to open image '{image_path}': {e}")
+        return False
+
+    if not sys.platform.startswith("win"):
+        # Convert all images to PNG for clipboard compatibility
+        # Note: GIFs (both animated and static) are converted to PNG for clipboard.
+        # This ensures compatibility with applications like Discord that don't
+        # support image/gif clipboard format on Linux. Animated GIFs will show
+        # only the first frame when pasted. To share animated GIFs, upload the
+        # file directly rather than using clipboard.
+        image_data = _encode_png(img, max_bytes)
+        if image_data is None:
+            print(f"Error: Unable to fit image '{image_path}' in {max_bytes} bytes")
+            return False
+        return _pipe_image(image_data)
+
+    try:
+        import win32clipboard
+        import win32con
+    except ImportError:
+        print("Error: win32clipboard module is required on Windows.")
+        return False
+
+    try:
+        # win32clipboard takes a DIB; animated GIFs become their first frame.
+        bmp = img.convert("RGB")
+        with io.BytesIO() as bmp_buffer:
+            bmp.save(bmp_buffer, "BMP")
+            dib_data = bmp_buffer.getvalue()[14:]
+        win32clipboard.OpenClipboard()
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(win32con.CF_DIB, dib_data)
+        win32clipboard.CloseClipboard()
+    except Exception as e:
+        print(f"Error copying image to clipboard: {e}")
+        return False
+    return True
+
+HEREDOC_DELIMITER_PREFIX = "EOF_CB_"
+
+
 def _choose_unique_heredoc_delimiter(contents: str) -> str:  # pragma: no cover
     """Choose a heredoc delimiter that does not appear in contents.
 
+    The contents are scanned once for the delimiter prefix, collecting the
+    text that follows each occurrence; a random candidate is then checked
+    against those few suffixes instead of searching the contents again.
+
     Args:
         contents: The string content that will be placed inside the heredoc.
 
@@ -361,11 +1107,22 @@ def _choose_unique_heredoc_delimiter(contents: str) -> str:  # pragma: no cover
     """
     import secrets
 
-    base = "EOF_CB_"
+    base = HEREDOC_DELIMITER_PREFIX
+    followers = set()
+    index = contents.find(base)
+    while index != -1:
+        start = index + len(base)
+        # Long enough to rule out the 32-digit fallback as well.
+        followers.add(contents[start:start + 32])
+        index = contents.find(base, start)
+
+    def collides(suffix: str) -> bool:
+        return any(follower.startswith(suffix) for follower in followers)
+
     for _ in range(10):
-        candidate = base + secrets.token_hex(4).upper()
-        if candidate not in contents:
-            return candidate
+        suffix = secrets.token_hex(4).upper()
+        if not collides(suffix):
+            return base + suffix
     return base + secrets.token_hex(16).upper()
 
 def _shell_single_quote(value: str) -> str:  # pragma: no cover
@@ -375,6 +1132,34 @@ def _shell_single_quote(value: str) -> str:  # pragma: no cover
     """
     return "'" + value.replace("'", "'\\''") + "'"
 
+HEREDOC_SHEBANG = "#!/usr/bin/env bash"
+
+
+def heredoc_file_block(path, contents, append: bool = False) -> Tuple[str, str, str]:
+    """Return the pieces of the heredoc script section that recreates one file.
+
+    The pieces follow ``HEREDOC_SHEBANG`` (or a previous block) directly, so
+    ``HEREDOC_SHEBANG`` followed by the blocks for every file is the complete
+    script.
+
+    Args:
+        path: Destination path written by the script.
+        contents: File contents placed inside the heredoc.
+        append: If True, appends to the file (>>); otherwise overwrites (>)
+
+    Returns:
+        Tuple of (commands, contents, terminator).
+    """
+    redir = ">>" if append else ">"
+    delimiter = _choose_unique_heredoc_delimiter(contents)
+    quoted_path = _shell_single_quote(path)
+    commands = (
+        f"\nmkdir -p \"$(dirname -- {quoted_path})\"\n"
+        f"cat {redir} {quoted_path} << '{delimiter}'\n"
+    )
+    return commands, contents, f"\n{delimiter}\n"
+
+
 def generate_heredoc_script(
     file_paths, file_contents_list, append: bool = False
 ) -> str:  # pragma: no cover
@@ -388,17 +1173,10 @@ def generate_heredoc_script(
     Returns:
         Combined shell script text for recreating the files on a target system.
     """
-    lines = ["#!/usr/bin/env bash"]
-    redir = ">>" if append else ">"
+    parts = [HEREDOC_SHEBANG]
     for path, contents in zip(file_paths, file_contents_list):
-        delimiter = _choose_unique_heredoc_delimiter(contents)
-        quoted_path = _shell_single_quote(path)
-        lines.append(f"mkdir -p \"$(dirname -- {quoted_path})\"")
-        lines.append(f"cat {redir} {quoted_path} << '{delimiter}'")
-        lines.append(contents)
-        lines.append(delimiter)
-        lines.append("")
-    return "\n".join(lines)
+        parts += heredoc_file_block(path, contents, append)
+    return "".join(parts)
 
 def copy_to_clipboard():  # pragma: no cover
     # Check if input is from STDIN or file
@@ -406,7 +1184,7 @@ def copy_to_clipboard():  # pragma: no cover
         # Read from STDIN
         try:
             content, _ = read_stdin_with_encoding()
-            pyperclip.copy(content)
+            copy_text_to_clipboard(content)
         except Exception as e:
             print(f"Error copying from STDIN: {e}", file=sys.stderr)
             sys.exit(1)
@@ -414,7 +1192,7 @@ def copy_to_clipboard():  # pragma: no cover
         # Existing file reading logic
         try:
             content, _ = read_with_encoding(sys.argv[1])
-            pyperclip.copy(content)
+            copy_text_to_clipboard(content)
         except FileNotFoundError:
             print(f"Error: File '{sys.argv[1]}' not found", file=sys.stderr)
             sys.exit(1)
@@ -422,11 +1200,45 @@ def copy_to_clipboard():  # pragma: no cover
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
 
-def get_file_stats(file_path):  # pragma: no cover
+def get_text_stats(content):  # pragma: no cover
+    """Get line, word and character statistics for decoded text.
+
+    Args:
+        content (str): Decoded file contents
+
+    Returns:
+        dict: Dictionary with the keys listed in ``TEXT_STAT_KEYS``
+    """
+    lines = content.splitlines()
+    words = content.split()
+
+    return {
+        'line_count': len(lines),
+        'word_count': len(words),
+        'char_count': len(content),
+        'char_no_spaces': len(content.replace(' ', '').replace('\n', '').replace('\r', '')),
+        'avg_line_length': len(content) / len(lines) if lines else 0,
+        'avg_word_length': sum(len(word) for word in words) / len(words) if words else 0,
+    }
+
+
+TEXT_STAT_KEYS = (
+    'line_count',
+    'word_count',
+    'char_count',
+    'char_no_spaces',
+    'avg_line_length',
+    'avg_word_length',
+)
+
+
+def get_file_stats(file_path, text_stats=None):  # pragma: no cover
     """Get detailed statistics about a file.
     
     Args:
         file_path (str): Path to the file
+        text_stats (dict, optional): Precomputed text statistics (for example
+            from a cache); when given, the file is not read
         
     Returns:
         dict: Dictionary containing file statistics
@@ -451,19 +1263,12 @@ def get_file_stats(file_path):  # pragma: no cover
     
     # Add text statistics if it's a text file
     if not file_stats['is_binary']:
+        if text_stats is not None:
+            file_stats.update(text_stats)
+            return file_stats
         try:
             content, _ = read_with_encoding(file_path)
-            lines = content.splitlines()
-            words = content.split()
-            
-            file_stats.update({
-                'line_count': len(lines),
-                'word_count': len(words),
-                'char_count': len(content),
-                'char_no_spaces': len(content.replace(' ', '').replace('\n', '').replace('\r', '')),
-                'avg_line_length': len(content) / len(lines) if lines else 0,
-                'avg_word_length': sum(len(word) for word in words) / len(words) if words else 0,
-            })
+            file_stats.update(get_text_stats(content))
         except Exception as e:
             file_stats['text_stats_error'] = str(e)
     
@@ -524,25 +1329,159 @@ def format_file_stats(file_path, stats, token_count=None):  # pragma: no cover
 
 encoding = "cl100k_base"
 
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(name: str = encoding):
+    """Return the tiktoken encoding used for token statistics (loaded once)."""
+    import tiktoken
+
+    return tiktoken.get_encoding(name)
+
+
+# Typical cl100k_base density for English prose and source code.
+BYTES_PER_TOKEN_ESTIMATE = 4.0
+
+
+def estimate_token_count(byte_count: int) -> int:
+    """Estimate the tokens in ``byte_count`` bytes of text without reading it."""
+    return int(-(-byte_count // BYTES_PER_TOKEN_ESTIMATE))
+
+
+TOKEN_CHUNK_SIZE = 256 * 1024
+_TOKEN_SPLIT_WINDOW = 4096
+
+# Positions where cl100k's pre-tokenizer always starts a new piece: a space
+# that follows a non-space character (the space is attached to the next word),
+# or a non-space character that follows a newline. Splitting text at such a
+# position yields exactly the same pieces, and so the same token count, as
+# encoding it in one go.
+_TOKEN_SPLIT_RE = re.compile(r"(?<=\S) |(?<=\n)\S")
+
+
+def _token_split_point(text: str, start: int, limit: int) -> Union[int, None]:
+    """Return the safe split position closest to ``limit``, if there is one."""
+    last = None
+    window_start = max(start + 1, limit - _TOKEN_SPLIT_WINDOW)
+    for match in _TOKEN_SPLIT_RE.finditer(text, window_start, limit):
+        last = match
+    if last is None and window_start > start + 1:
+        for match in _TOKEN_SPLIT_RE.finditer(text, start + 1, window_start):
+            last = match
+    if last is not None:
+        return last.start()
+    # No safe point before the limit (e.g. a huge unbroken line): take the next
+    # one after it so the count stays exact.
+    match = _TOKEN_SPLIT_RE.search(text, limit)
+    return match.start() if match else None
+
+
+def count_tokens(text: str, chunk_size: Union[int, None] = None) -> int:
+    """Count tokens without materializing the whole token list.
+
+    The text is encoded in chunks of about ``chunk_size`` characters, split
+    only where the tokenizer's pre-tokenization starts a new piece, so the
+    result equals ``len(enc.encode_ordinary(text))`` while peak memory stays
+    proportional to one chunk.
+
+    Args:
+        text: Text to count
+        chunk_size (int, optional): Target chunk length in characters;
+            defaults to ``TOKEN_CHUNK_SIZE``
+
+    Returns:
+        int: Number of tokens
+    """
+    enc = get_tokenizer()
+    size = chunk_size or TOKEN_CHUNK_SIZE
+    total = 0
+    start = 0
+    while len(text) - start > size:
+        end = _token_split_point(text, start, start + size)
+        if end is None:
+            break
+        total += len(enc.encode_ordinary(text[start:end]))
+        start = end
+    return total + len(enc.encode_ordinary(text[start:]))
+
+
+def _parallel_map(func, items, workers: int) -> list:
+    """Return ``[func(item) for item in items]``, computed on a thread pool.
+
+    The pool is skipped for a single worker or item. Used where every result
+    is needed at once; :func:`copybuffer.main.read_entries` streams instead.
+    """
+    items = list(items)
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def count_tokens_batch(texts, num_threads=None):
+    """Count tokens for many texts on a thread pool.
+
+    Each text is counted with :func:`count_tokens`; tiktoken releases the GIL
+    while encoding, so the work spreads across cores. Special-token markers
+    such as ``<|endoftext|>`` are counted as ordinary text rather than rejected.
+
+    Args:
+        texts: Iterable of strings to count
+        num_threads (int, optional): Worker threads; defaults to the CPU count
+
+    Returns:
+        list: Token count for each text, in input order
+    """
+    return _parallel_map(count_tokens, texts, num_threads or os.cpu_count() or 1)
+
+
 __all__ = [
     "__VERSION__",
     "detect_encoding",
     "read_with_encoding",
     "read_stdin_with_encoding",
+    "STDIN_CHUNK_SIZE",
+    "StdinReader",
+    "strip_chunks",
+    "SNIFF_SIZE",
+    "sniff_binary",
+    "sniff_file",
     "is_wayland",
     "is_wlclipboard_installed",
     "is_xclip_installed",
     "is_xsel_installed",
     "has_display",
     "is_pyperclip_installed",
+    "default_cache_dir",
+    "ClipboardBackend",
+    "detect_clipboard_backend",
+    "get_clipboard_backend",
     "check_dependencies",
     "install_dependencies",
+    "copy_text_to_clipboard",
+    "clipboard_unavailable_message",
+    "format_file_block",
+    "DuplicateOf",
+    "format_duplicate_block",
     "copy_file_contents_to_clipboard",
     "copy_image_to_clipboard",
+    "PNG_SIGNATURE",
+    "PNG_COMPRESS_LEVEL",
+    "HEREDOC_SHEBANG",
+    "heredoc_file_block",
     "generate_heredoc_script",
     "copy_to_clipboard",
+    "get_text_stats",
+    "TEXT_STAT_KEYS",
     "get_file_stats",
     "format_file_stats",
     "encoding",
+    "get_tokenizer",
+    "BYTES_PER_TOKEN_ESTIMATE",
+    "estimate_token_count",
+    "count_tokens",
+    "count_tokens_batch",
 ]
 
@@ -0,0 +1,111 @@
+"""File listings from the local git repository.
+
+Asking git for the files it tracks is much cheaper than walking a large
+tree and matching ignore patterns, since git already keeps the list in its
+index. Every function here returns None when the directory is not in a
+repository or git is unavailable, so callers can fall back to walking.
+"""
+
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from .ignore import find_git_dir
+
+SUBMODULE_MODE = b"160000"
+SYMLINK_MODE = b"120000"
+
+
+def run_git(args: Sequence[str], cwd: Path) -> Optional[bytes]:
+    """Run a git command in ``cwd`` and return its stdout, or None on failure."""
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, capture_output=True, stdin=subprocess.DEVNULL
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def _split_paths(output: Optional[bytes]) -> List[str]:
+    if not output:
+        return []
+    return [os.fsdecode(path) for path in output.split(b"\0") if path]
+
+
+def list_git_files(directory: Path, untracked: bool = False) -> Optional[List[str]]:
+    """List the files git knows about below ``directory``.
+
+    Tracked files come from ``git ls-files -s``; submodules and tracked files
+    deleted from the working tree are left out. With ``untracked``, files
+    that are neither tracked nor ignored are added after them.
+
+    Args:
+        directory: Directory to list
+        untracked: Also list untracked files that are not ignored
+
+    Returns:
+        Paths relative to ``directory`` using ``/`` separators, or None if
+        ``directory`` is not inside a git repository.
+    """
+    if find_git_dir(directory) is None:
+        return None
+    staged = run_git(["ls-files", "-z", "-s"], directory)
+    if staged is None:
+        return None
+    deleted = set(_split_paths(run_git(["ls-files", "-z", "--deleted"], directory)))
+
+    files: List[str] = []
+    seen = set()
+    for record in staged.split(b"\0"):
+        if not record:
+            continue
+        info, _, raw_path = record.partition(b"\t")
+        mode = info.split(b" ", 1)[0]
+        if mode == SUBMODULE_MODE:
+            continue
+        path = os.fsdecode(raw_path)
+        # Unmerged paths appear once per conflict stage.
+        if path in seen or path in deleted:
+            continue
+        seen.add(path)
+        if mode == SYMLINK_MODE and not os.path.isfile(directory / path):
+            continue
+        files.append(path)
+
+    if untracked:
+        others = run_git(["ls-files", "-z", "--others", "--exclude-standard"], directory)
+        for path in _split_paths(others):
+            if path not in seen and os.path.isfile(directory / path):
+                files.append(path)
+    return files
+
+
+def list_changed_files(root: Path, ref: str = "HEAD") -> Optional[List[str]]:
+    """List files in the working tree that differ from ``ref``.
+
+    Covers staged and unstaged modifications (``git diff --name-only REF``)
+    plus untracked files that are not ignored. Deleted files are left out.
+
+    Args:
+        root: Top-level directory of the repository
+        ref: Commit, branch or tag to compare with
+
+    Returns:
+        Paths relative to ``root`` using ``/`` separators, or None if ``root``
+        is not a repository or ``ref`` cannot be resolved.
+    """
+    diff = run_git(["diff", "--name-only", "-z", "--diff-filter=d", ref, "--"], root)
+    if diff is None:
+        return None
+    files = _split_paths(diff)
+    seen = set(files)
+    others = run_git(["ls-files", "-z", "--others", "--exclude-standard"], root)
+    files.extend(path for path in _split_paths(others) if path not in seen)
+    return files
+
+
+__all__ = ["list_changed_files", "list_git_files", "run_git"]
@@ -0,0 +1,283 @@
+"""Layered gitignore matching with git's precedence rules.
+
+Patterns come from, in increasing order of precedence:
+
+1. the global excludes file (``core.excludesFile``, by default
+   ``$XDG_CONFIG_HOME/git/ignore``),
+2. ``$GIT_DIR/info/exclude``,
+3. ``.gitignore`` files from the repository root down to the directory of
+   the path being checked, deeper files overriding shallower ones.
+
+Within that order the last matching pattern decides, and a path inside an
+ignored directory stays ignored whatever the deeper files say (callers that
+walk a tree get this for free by pruning ignored directories). Each
+directory's ``.gitignore`` is compiled into a ``PathSpec`` once, on first
+use, and cached on the matcher.
+
+Outside a git repository the directory the matcher was created for acts as
+the root and only ``.gitignore`` files are used.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import subprocess
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pathspec import PathSpec
+
+#: Names that are always ignored, whatever the ignore files say.
+ALWAYS_IGNORED_NAMES = frozenset({".git"})
+
+
+def _compile(lines: Iterable[str]) -> Optional[PathSpec]:
+    # Imported here so that STDIN and single-file runs don't pay for pathspec.
+    from pathspec import PathSpec
+
+    lines = [line for line in lines if line.strip() and not line.startswith("#")]
+    if not lines:
+        return None
+    try:
+        return PathSpec.from_lines("gitignore", lines)
+    except KeyError:
+        # pathspec < 1.0 only knows the older factory name.
+        return PathSpec.from_lines("gitwildmatch", lines)
+
+
+def _read_patterns(path: Path) -> List[str]:
+    try:
+        return path.read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+
+
+def _check(spec: PathSpec, path: str) -> Optional[bool]:
+    """Return True/False if the last matching pattern ignores/re-includes path.
+
+    None means no pattern matched.
+    """
+    check_file = getattr(spec, "check_file", None)
+    if check_file is not None:
+        return check_file(path).include
+    # pathspec < 0.12 has no check_file; evaluate the patterns in order.
+    result = None
+    for pattern in spec.patterns:
+        if pattern.include is not None and pattern.match_file(path) is not None:
+            result = pattern.include
+    return result
+
+
+def _checker(spec: PathSpec) -> Callable[[str], Optional[bool]]:
+    """Return a fast equivalent of ``_check`` bound to ``spec``.
+
+    Patterns are tried last to first so the first regex hit decides, which
+    skips pathspec's per-call normalization and result objects. Patterns
+    without a compiled regex fall back to ``_check``.
+    """
+    rules = []
+    for pattern in reversed(spec.patterns):
+        if pattern.include is None:
+            continue
+        regex = getattr(pattern, "regex", None)
+        if regex is None:
+            return functools.partial(_check, spec)
+        rules.append((regex.search, pattern.include))
+
+    def check(path: str) -> Optional[bool]:
+        for search, include in rules:
+            if search(path) is not None:
+                return include
+        return None
+
+    return check
+
+
+def find_git_dir(start: Path) -> Optional[Path]:
+    """Return the ``.git`` entry of the repository containing ``start``, if any.
+
+    The returned path is a directory, or a file for worktrees and submodules.
+    """
+    for directory in (start, *start.parents):
+        candidate = directory / ".git"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _resolve_git_dir(dot_git: Path) -> Path:
+    """Follow a ``gitdir:`` file (worktrees, submodules) to the real git dir."""
+    if dot_git.is_file():
+        for line in _read_patterns(dot_git):
+            if line.startswith("gitdir:"):
+                git_dir = Path(line[len("gitdir:"):].strip())
+                if not git_dir.is_absolute():
+                    git_dir = dot_git.parent / git_dir
+                return git_dir
+    return dot_git
+
+
+def global_excludes_file(root: Path) -> Optional[Path]:
+    """Return the global excludes file git would use for the repository at root."""
+    try:
+        result = subprocess.run(
+            ["git", "config", "--path", "--get", "core.excludesFile"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        result = None
+    if result is not None and result.returncode == 0 and result.stdout.strip():
+        return Path(result.stdout.strip()).expanduser()
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return Path(config_home) / "git" / "ignore"
+
+
+class IgnoreMatcher:
+    """Decide whether paths below ``root`` are ignored.
+
+    Use :meth:`for_directory` to build a matcher for the repository (or
+    plain directory) containing a path.
+
+    Args:
+        root: Directory that ``.gitignore`` lookups start from.
+        base_patterns: Global and ``info/exclude`` patterns, lowest
+            precedence first, matched relative to ``root``.
+    """
+
+    #: Global excludes file read by :meth:`for_directory`, if any.
+    excludes_file: Optional[Path] = None
+
+    def __init__(self, root: Path, base_patterns: Iterable[str] = ()):
+        self.root = root
+        self._base_spec = _compile(base_patterns)
+        self._specs: Dict[str, Optional[PathSpec]] = {}
+        self._chains: Dict[str, List[Tuple[int, Callable[[str], Optional[bool]]]]] = {}
+
+    @staticmethod
+    def root_for(directory: Path) -> Path:
+        """Return the root :meth:`for_directory` would use, without running git."""
+        dot_git = find_git_dir(directory)
+        return directory if dot_git is None else dot_git.parent
+
+    @classmethod
+    def for_directory(
+        cls, directory: Path, excludes_file: Optional[Path] = None
+    ) -> "IgnoreMatcher":
+        """Build the matcher for the git repository containing ``directory``.
+
+        Outside a repository, ``directory`` itself becomes the root.
+
+        Args:
+            directory: Directory the matcher is for
+            excludes_file: Global excludes file, if already known; otherwise
+                it is looked up with :func:`global_excludes_file`, which runs
+                git
+        """
+        dot_git = find_git_dir(directory)
+        if dot_git is None:
+            return cls(directory)
+        root = dot_git.parent
+        patterns: List[str] = []
+        if excludes_file is None:
+            excludes_file = global_excludes_file(root)
+        if excludes_file is not None:
+            patterns.extend(_read_patterns(excludes_file))
+        patterns.extend(_read_patterns(_resolve_git_dir(dot_git) / "info" / "exclude"))
+        matcher = cls(root, patterns)
+        matcher.excludes_file = excludes_file
+        return matcher
+
+    def spec_for(self, directory: str) -> Optional[PathSpec]:
+        """Return the compiled ``.gitignore`` of a root-relative directory."""
+        try:
+            return self._specs[directory]
+        except KeyError:
+            pass
+        gitignore = self.root / directory / ".gitignore" if directory else self.root / ".gitignore"
+        spec = _compile(_read_patterns(gitignore))
+        self._specs[directory] = spec
+        return spec
+
+    def relative(self, path: Path) -> Optional[str]:
+        """Return ``path`` relative to the root in POSIX form, or None if outside.
+
+        The path is compared lexically; it is not resolved.
+        """
+        try:
+            relative = path.relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+        return "" if relative == "." else relative
+
+    def _chain(self, directory: str) -> List[Tuple[int, Callable[[str], Optional[bool]]]]:
+        """Return ``(offset, check)`` for each ignore file applying in ``directory``.
+
+        Deepest first; ``offset`` is the length of the root-relative prefix to
+        strip from a path before passing it to ``check``.
+        """
+        try:
+            return self._chains[directory]
+        except KeyError:
+            pass
+        if directory:
+            parent, _, _ = directory.rpartition("/")
+            chain = list(self._chain(parent))
+            spec = self.spec_for(directory)
+            if spec is not None:
+                chain.insert(0, (len(directory) + 1, _checker(spec)))
+        else:
+            spec = self.spec_for("")
+            chain = [] if spec is None else [(0, _checker(spec))]
+            if self._base_spec is not None:
+                chain.append((0, _checker(self._base_spec)))
+        self._chains[directory] = chain
+        return chain
+
+    def match(self, relative: str, is_dir: bool = False) -> bool:
+        """Return True if a root-relative path is ignored by its own patterns.
+
+        Ancestor directories are not checked; callers walking a tree prune
+        ignored directories instead. See :meth:`is_ignored`.
+        """
+        directory, _, name = relative.rpartition("/")
+        if name in ALWAYS_IGNORED_NAMES:
+            return True
+        path = relative + "/" if is_dir else relative
+        for offset, check in self._chain(directory):
+            result = check(path[offset:])
+            if result is not None:
+                return result
+        return False
+
+    def is_ignored(self, path: Path, is_dir: Optional[bool] = None) -> bool:
+        """Return True if ``path`` or any directory between it and the root is ignored.
+
+        Paths outside the root are only checked against
+        ``ALWAYS_IGNORED_NAMES``.
+        """
+        if is_dir is None:
+            is_dir = path.is_dir()
+        relative = self.relative(path)
+        if relative is None:
+            return any(part in ALWAYS_IGNORED_NAMES for part in path.parts)
+        if not relative:
+            return False
+        parts = relative.split("/")
+        for depth in range(1, len(parts)):
+            if self.match("/".join(parts[:depth]), is_dir=True):
+                return True
+        return self.match(relative, is_dir)
+
+
+__all__ = [
+    "ALWAYS_IGNORED_NAMES",
+    "IgnoreMatcher",
+    "find_git_dir",
+    "global_excludes_file",
+]
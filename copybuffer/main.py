@@ -1,32 +1,51 @@
+from __future__ import annotations
+
 import argparse
+import contextlib
 import mimetypes
+import os
+import re
 import sys
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Sequence, Tuple
-
-import pyperclip
-import tiktoken
-from pathspec import PathSpec
-
-DEFAULT_IGNORE_PATTERNS = [
-    ".git",
-    ".git/",
-    ".git/**",
-]
+from typing import Dict, Iterable, Iterator, Set, List, Optional, Sequence, Tuple
 
 from .core import (
     __VERSION__,
     check_dependencies,
-    copy_file_contents_to_clipboard,
     copy_image_to_clipboard,
-    generate_heredoc_script,
+    get_clipboard_backend,
     get_file_stats,
+    get_text_stats,
+    count_tokens,
+    count_tokens_batch,
+    _parallel_map,
+    TEXT_STAT_KEYS,
     format_file_stats,
     install_dependencies,
     encoding,
-    read_stdin_with_encoding,
+    StdinReader,
+    strip_chunks,
     read_with_encoding,
+    sniff_file,
+    BYTES_PER_TOKEN_ESTIMATE,
+    estimate_token_count,
+    DuplicateOf,
+)
+from .gitfiles import list_changed_files, list_git_files
+from .ignore import IgnoreMatcher, find_git_dir
+from .sinks import (
+    CaptureSink,
+    ClipboardSink,
+    FileSink,
+    OutputError,
+    Sink,
+    open_sink,
+    write_compressed_script,
+    write_file_contents,
+    write_heredoc_script,
+    write_text_stream,
 )
 
 
@@ -34,26 +53,34 @@ from .core import (
 class FileEntry:
     abs_path: Path
     display_path: str
+    # Set by budgets: read at most this many bytes, from the end if read_tail.
+    read_limit: Optional[int] = None
+    read_tail: bool = False
+    # Named on the command line rather than found in a directory.
+    explicit: bool = False
+    # Set by --dedup: an earlier entry with identical content, and the size
+    # the entry was compared at.
+    duplicate_of: Optional["FileEntry"] = None
+    size: Optional[int] = None
 
 
-def _load_gitignore_spec(base_dir: Path) -> PathSpec | None:
-    gitignore_path = base_dir / ".gitignore"
-    lines: List[str] = list(DEFAULT_IGNORE_PATTERNS)
-    if gitignore_path.is_file():
-        lines.extend(gitignore_path.read_text().splitlines())
-    if not lines:
-        return None
-    return PathSpec.from_lines("gitwildmatch", lines)
+@dataclass
+class FileRecord:
+    """Everything read or computed for one file.
 
+    A record is built once per file and shared by the clipboard, heredoc and
+    statistics outputs so no file is read or decoded more than once.
+    ``content`` is the decoded text exactly as read (outputs strip it
+    themselves); ``stats`` and ``token_count`` are only filled in for
+    ``--tokens``.
+    """
 
-def _is_ignored(path: Path, spec: PathSpec | None, base_dir: Path) -> bool:
-    if spec is None:
-        return False
-    try:
-        relative = path.resolve().relative_to(base_dir)
-    except ValueError:
-        relative = path.resolve()
-    return spec.match_file(str(relative))
+    entry: FileEntry
+    content: Optional[str] = None
+    encoding: Optional[str] = None
+    error: Optional[Exception] = None
+    stats: Optional[dict] = None
+    token_count: Optional[int] = None
 
 
 def _classify_path(
@@ -70,48 +97,97 @@ def _classify_path(
     return [entry], []
 
 
-def _discover_directory(
-    original_argument: str,
+def _walk_directory(
     directory: Path,
     recursive: bool,
-    allow_images: bool,
-    spec: PathSpec | None,
-    base_dir: Path,
+    matcher: IgnoreMatcher,
     debug: bool = False,
-) -> Tuple[List[FileEntry], List[FileEntry]]:
-    text_entries: List[FileEntry] = []
-    image_entries: List[FileEntry] = []
-    iterator: Iterable[Path]
-    if recursive:
-        iterator = directory.rglob("*")
-    else:
-        iterator = directory.iterdir()
+) -> Iterator[Tuple[os.DirEntry, str]]:
+    """Yield ``(dir_entry, relative_path)`` for files below ``directory``.
 
-    for child in iterator:
-        if _is_ignored(child, spec, base_dir):
-            if debug:
-                print(f"Debug: Skipping ignored path {child}")
-            continue
+    Uses ``os.scandir`` so file types come from the directory listing, and
+    matches ignore rules against paths built lexically from the matcher's
+    root instead of resolving each one. Ignored directories are pruned before
+    they are entered and symlinked directories are not followed.
+    ``relative_path`` is relative to ``directory``, which must be inside the
+    matcher's root.
+    """
+    match_prefix = matcher.relative(directory) or ""
+    if match_prefix:
+        match_prefix += "/"
 
+    stack = [(str(directory), "")]
+    while stack:
+        path, relative = stack.pop()
         try:
-            is_dir = child.is_dir()
+            iterator = os.scandir(path)
         except OSError:
             continue
+        with iterator:
+            for dir_entry in iterator:
+                child_relative = relative + dir_entry.name
+                try:
+                    is_dir = dir_entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    if not recursive:
+                        continue
+                    if matcher.match(match_prefix + child_relative, is_dir=True):
+                        if debug:
+                            print(f"Debug: Skipping ignored path {dir_entry.path}")
+                        continue
+                    stack.append((dir_entry.path, child_relative + "/"))
+                    continue
 
-        if is_dir:
-            # Skip directories; files within will be handled via rglob.
-            continue
+                if matcher.match(match_prefix + child_relative):
+                    if debug:
+                        print(f"Debug: Skipping ignored path {dir_entry.path}")
+                    continue
+                try:
+                    if not dir_entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                yield dir_entry, child_relative
 
-        if not child.is_file():
-            continue
 
-        try:
-            relative = child.relative_to(directory)
-            display_path = str(Path(original_argument) / relative)
-        except ValueError:
-            display_path = str(child)
+def _discover_directory(
+    original_argument: str,
+    directory: Path,
+    recursive: bool,
+    allow_images: bool,
+    matcher: IgnoreMatcher,
+    debug: bool = False,
+    use_git: bool = False,
+    include_untracked: bool = False,
+) -> Tuple[List[FileEntry], List[FileEntry]]:
+    text_entries: List[FileEntry] = []
+    image_entries: List[FileEntry] = []
+    display_prefix = str(Path(original_argument))
+
+    listed = list_git_files(directory, include_untracked) if use_git else None
+    if listed is not None:
+        if not recursive:
+            listed = [relative for relative in listed if "/" not in relative]
+        files = ((os.path.join(directory, relative), relative) for relative in listed)
+    else:
+        if use_git and debug:
+            print(f"Debug: {directory} is not in a git repository; walking it instead")
+        files = (
+            (dir_entry.path, relative)
+            for dir_entry, relative in _walk_directory(directory, recursive, matcher, debug)
+        )
 
-        text, images = _classify_path(child, display_path, allow_images)
+    for path, relative in files:
+        if os.sep != "/":
+            relative = relative.replace("/", os.sep)
+        if display_prefix != ".":
+            display_path = os.path.join(display_prefix, relative)
+        else:
+            display_path = relative
+
+        text, images = _classify_path(Path(path), display_path, allow_images)
         text_entries.extend(text)
         image_entries.extend(images)
 
@@ -127,15 +203,48 @@ def discover_files(
     allow_images: bool,
     base_dir: Path | None = None,
     debug: bool = False,
+    use_git: bool = False,
+    include_untracked: bool = False,
+    exclude: Iterable[Path] = (),
 ) -> Tuple[List[FileEntry], List[FileEntry], List[str], List[str]]:
+    """Expand file and directory arguments into text and image entries.
+
+    Directories are walked honouring git's ignore rules, or with
+    ``use_git`` listed from the git index (tracked files, plus untracked
+    files that are not ignored with ``include_untracked``), falling back to
+    the walk outside a repository. Files in ``exclude`` (resolved paths,
+    such as the ``--output`` file) are left out.
+
+    Returns:
+        Tuple of (text_entries, image_entries, missing, directory_errors).
+    """
     base_dir = (base_dir or Path.cwd()).resolve()
-    spec = _load_gitignore_spec(base_dir)
+    matchers: Dict[Path, IgnoreMatcher] = {}
+    base_matcher = IgnoreMatcher.for_directory(base_dir)
+    matchers[base_matcher.root] = base_matcher
+
+    # Resolved once per run; looking it up runs git.
+    excludes_file = base_matcher.excludes_file
+
+    def matcher_for(directory: Path) -> IgnoreMatcher:
+        nonlocal excludes_file
+        # Paths outside the base directory's repository follow their own
+        # repository's ignore rules.
+        if base_matcher.relative(directory) is not None:
+            return base_matcher
+        root = IgnoreMatcher.root_for(directory)
+        matcher = matchers.get(root)
+        if matcher is None:
+            matcher = IgnoreMatcher.for_directory(directory, excludes_file)
+            excludes_file = excludes_file or matcher.excludes_file
+            matchers[root] = matcher
+        return matcher
 
     text_entries: List[FileEntry] = []
     image_entries: List[FileEntry] = []
     missing: List[str] = []
     directory_errors: List[str] = []
-    seen: set[Path] = set()
+    seen: set[Path] = set(exclude)
 
     for raw_path in inputs:
         provided_path = Path(raw_path)
@@ -155,9 +264,10 @@ def discover_files(
                 candidate,
                 effective_recursive,
                 allow_images,
-                spec,
-                base_dir,
+                matcher_for(candidate),
                 debug,
+                use_git,
+                include_untracked,
             )
             for entry in dir_text:
                 if entry.abs_path in seen:
@@ -171,7 +281,7 @@ def discover_files(
                 image_entries.append(entry)
             continue
 
-        if _is_ignored(candidate, spec, base_dir):
+        if matcher_for(candidate.parent).is_ignored(candidate, is_dir=False):
             if debug:
                 print(f"Debug: Skipping ignored path {candidate}")
             continue
@@ -186,12 +296,574 @@ def discover_files(
         seen.add(candidate)
 
         text, images = _classify_path(candidate, display_path, True)
+        for entry in text + images:
+            entry.explicit = True
         text_entries.extend(text)
         image_entries.extend(images)
 
     return text_entries, image_entries, missing, directory_errors
 
 
+def _sniff_entry(entry: FileEntry) -> Optional[str]:
+    try:
+        return sniff_file(entry.abs_path)
+    except OSError:
+        # Unreadable files are reported when they are read.
+        return None
+
+
+def filter_binary_entries(
+    entries: Sequence[FileEntry], jobs: Optional[int] = None
+) -> Tuple[List[FileEntry], List[Tuple[FileEntry, str]]]:
+    """Split entries into text files and binary files by sniffing their content.
+
+    Only the first ``SNIFF_SIZE`` bytes of each file are read, on a thread
+    pool like :func:`read_entries`, so binaries are dropped before they cost
+    a full read and decode.
+
+    Returns:
+        Tuple of (text_entries, skipped) where skipped holds
+        ``(entry, reason)`` pairs; both keep the input order.
+    """
+    reasons = _parallel_map(_sniff_entry, entries, jobs or default_jobs())
+
+    text_entries: List[FileEntry] = []
+    skipped: List[Tuple[FileEntry, str]] = []
+    for entry, reason in zip(entries, reasons):
+        if reason is None:
+            text_entries.append(entry)
+        else:
+            skipped.append((entry, reason))
+    return text_entries, skipped
+
+
+#: Bytes read at a time when hashing files for --dedup.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_entry(entry: FileEntry) -> Optional[bytes]:
+    # Only --dedup hashes files; importing hashlib here keeps startup fast.
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(entry.abs_path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except OSError:
+        # Unreadable files are reported when they are read.
+        return None
+    return digest.digest()
+
+
+def find_duplicates(
+    entries: Sequence[FileEntry], jobs: Optional[int] = None
+) -> Tuple[List[FileEntry], List[FileEntry]]:
+    """Split entries into unique files and duplicates of earlier entries.
+
+    Only files sharing a size with another file are candidates. Hard links
+    are matched by inode without reading them; the remaining candidates are
+    hashed with BLAKE2b on a thread pool like :func:`read_entries`. Each
+    duplicate gets ``duplicate_of`` set to the first entry with the same
+    content. Empty files and truncated reads are never treated as duplicates.
+
+    Returns:
+        Tuple of (unique_entries, duplicates), both in input order.
+    """
+    by_size: Dict[int, List[Tuple[FileEntry, os.stat_result]]] = {}
+    for entry in entries:
+        if entry.read_limit is not None:
+            continue
+        try:
+            st = entry.abs_path.stat()
+        except OSError:
+            continue
+        entry.size = st.st_size
+        if st.st_size:
+            by_size.setdefault(st.st_size, []).append((entry, st))
+
+    groups: List[List[FileEntry]] = []
+    for candidates in by_size.values():
+        if len(candidates) < 2:
+            continue
+        inodes: Dict[Tuple[int, int], FileEntry] = {}
+        group = []
+        for entry, st in candidates:
+            first = inodes.setdefault((st.st_dev, st.st_ino), entry)
+            if first is entry:
+                group.append(entry)
+            else:
+                entry.duplicate_of = first
+        if len(group) > 1:
+            groups.append(group)
+
+    to_hash = [entry for group in groups for entry in group]
+    digests = _parallel_map(_hash_entry, to_hash, jobs or default_jobs())
+    digest_of = {id(entry): digest for entry, digest in zip(to_hash, digests)}
+
+    for group in groups:
+        firsts: Dict[bytes, FileEntry] = {}
+        for entry in group:
+            digest = digest_of[id(entry)]
+            if digest is not None:
+                first = firsts.setdefault(digest, entry)
+                if first is not entry:
+                    entry.duplicate_of = first
+
+    unique: List[FileEntry] = []
+    duplicates: List[FileEntry] = []
+    for entry in entries:
+        # A hard link may point at an entry that is itself a duplicate.
+        while entry.duplicate_of is not None and entry.duplicate_of.duplicate_of is not None:
+            entry.duplicate_of = entry.duplicate_of.duplicate_of
+        (unique if entry.duplicate_of is None else duplicates).append(entry)
+    return unique, duplicates
+
+
+def filter_changed(
+    entries: Sequence[FileEntry], ref: str = "HEAD", debug: bool = False
+) -> List[FileEntry]:
+    """Keep the entries that differ from a git ref.
+
+    Files count as changed when ``git diff REF`` lists them or they are
+    untracked and not ignored. Entries outside a git repository are dropped.
+    Nothing is read; git compares the working tree itself.
+
+    Raises:
+        ValueError: If git cannot compare a repository with ``ref``.
+    """
+    changed_by_root: Dict[Path, Set[str]] = {}
+    root_by_parent: Dict[Path, Optional[Path]] = {}
+    kept: List[FileEntry] = []
+    for entry in entries:
+        parent = entry.abs_path.parent
+        if parent not in root_by_parent:
+            dot_git = find_git_dir(parent)
+            root_by_parent[parent] = None if dot_git is None else dot_git.parent
+        root = root_by_parent[parent]
+        if root is None:
+            if debug:
+                print(f"Debug: Skipping {entry.display_path}: not in a git repository")
+            continue
+        if root not in changed_by_root:
+            changed = list_changed_files(root, ref)
+            if changed is None:
+                raise ValueError(f"cannot compare '{root}' with git ref '{ref}'")
+            changed_by_root[root] = set(changed)
+        if entry.abs_path.relative_to(root).as_posix() in changed_by_root[root]:
+            kept.append(entry)
+    return kept
+
+
+def filter_since_last(
+    entries: Sequence[FileEntry], snapshot
+) -> Tuple[List[FileEntry], List[Tuple[Path, tuple]]]:
+    """Keep the entries that are new or modified since ``snapshot`` was saved.
+
+    Only ``stat`` is used. Returns the kept entries and the current
+    ``(path, fingerprint)`` of every entry, for saving the next snapshot.
+    """
+    from .cache import file_fingerprint
+
+    kept: List[FileEntry] = []
+    fingerprints: List[Tuple[Path, tuple]] = []
+    for entry in entries:
+        try:
+            fingerprint = file_fingerprint(entry.abs_path.stat())
+        except OSError:
+            # Let the read report the problem.
+            kept.append(entry)
+            continue
+        fingerprints.append((entry.abs_path, fingerprint))
+        if snapshot.is_changed(entry.abs_path, fingerprint):
+            kept.append(entry)
+    return kept, fingerprints
+
+
+BUDGET_POLICIES = ("skip", "head", "tail", "stop")
+_SIZE_RE = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte size such as ``500``, ``64K``, ``10MB`` or ``1GiB`` (binary units)."""
+    match = _SIZE_RE.fullmatch(value)
+    if match is None:
+        raise ValueError(f"invalid size '{value}'")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.upper()])
+
+
+def _size_argument(value: str) -> int:
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+@dataclass
+class BudgetResult:
+    """Outcome of :func:`apply_budgets`.
+
+    ``kept`` are the entries to read (truncated ones carry a ``read_limit``),
+    ``truncated`` is the subset of ``kept`` that will be cut short and
+    ``dropped`` holds ``(entry, reason)`` for everything left out.
+    """
+
+    kept: List[FileEntry]
+    truncated: List[FileEntry]
+    dropped: List[Tuple[FileEntry, str]]
+    dropped_bytes: int = 0
+
+
+def apply_budgets(
+    entries: Sequence[FileEntry],
+    max_file_size: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    policy: str = "skip",
+) -> BudgetResult:
+    """Fit entries into size and token budgets using only ``stat`` sizes.
+
+    Token budgets are converted to bytes with ``BYTES_PER_TOKEN_ESTIMATE``.
+    Entries over a budget are handled by ``policy``:
+
+    - ``skip``: leave the file out and carry on with the next one.
+    - ``head`` / ``tail``: keep the start / end of the file that still fits.
+    - ``stop``: leave out this file and everything after it.
+    """
+    if policy not in BUDGET_POLICIES:
+        raise ValueError(f"unknown budget policy '{policy}'")
+    total_limit = max_total_bytes
+    if max_tokens is not None:
+        token_bytes = int(max_tokens * BYTES_PER_TOKEN_ESTIMATE)
+        total_limit = token_bytes if total_limit is None else min(total_limit, token_bytes)
+
+    result = BudgetResult([], [], [])
+    used = 0
+    stopped = False
+    for entry in entries:
+        try:
+            size = entry.abs_path.stat().st_size
+        except OSError:
+            # Let the read report the problem.
+            result.kept.append(entry)
+            continue
+        if stopped:
+            result.dropped.append((entry, "stopped at budget"))
+            result.dropped_bytes += size
+            continue
+
+        allowed = size
+        reason = None
+        if max_file_size is not None and size > max_file_size:
+            allowed = max_file_size
+            reason = "larger than --max-file-size"
+        if total_limit is not None and used + allowed > total_limit:
+            allowed = max(total_limit - used, 0)
+            reason = reason or "over the total budget"
+
+        if reason is None:
+            result.kept.append(entry)
+            used += size
+        elif policy in ("head", "tail") and allowed > 0:
+            entry.read_limit = allowed
+            entry.read_tail = policy == "tail"
+            result.kept.append(entry)
+            result.truncated.append(entry)
+            result.dropped_bytes += size - allowed
+            used += allowed
+        else:
+            result.dropped.append((entry, reason))
+            result.dropped_bytes += size
+            stopped = policy == "stop"
+    return result
+
+
+def _format_size(size: int) -> str:
+    for unit in ("bytes", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+BUDGET_ORDERS = ("depth", "recent")
+
+#: Files are read and counted while their estimated total stays within the
+#: token budget plus this fraction, so a low estimate still fills the budget.
+TOKEN_BUDGET_SLACK = 0.25
+
+#: Selection rounds; each one recalibrates the bytes-per-token estimate from
+#: the files counted so far.
+TOKEN_BUDGET_ROUNDS = 3
+
+
+@dataclass
+class PackResult:
+    """Outcome of :func:`pack_token_budget`.
+
+    ``records`` are the files that fit, in input order, already read and
+    with ``token_count`` set; ``dropped`` are the entries left out, and
+    ``counted`` is the number of files that had to be tokenized.
+    """
+
+    records: List[FileRecord]
+    dropped: List[FileEntry]
+    tokens: int = 0
+    counted: int = 0
+
+
+def pack_token_budget(
+    entries: Sequence[FileEntry],
+    budget: int,
+    order: str = "depth",
+    cache=None,
+    jobs: Optional[int] = None,
+) -> PackResult:
+    """Choose the files that fit in ``budget`` tokens, tokenizing as few as possible.
+
+    Files are taken by priority: explicit arguments first, then the
+    shallowest paths (``depth``) or the most recently modified files
+    (``recent``). Each file's tokens are estimated from its size; only files
+    whose estimate could still fit are read and counted exactly. The
+    bytes-per-token ratio is then recalibrated from those counts and
+    selection repeats for files the first estimate ruled out. With a cache,
+    unchanged files reuse their stored count and new counts are stored.
+
+    Selection is greedy: a file that does not fit is skipped and smaller
+    files after it may still be taken.
+    """
+    if order not in BUDGET_ORDERS:
+        raise ValueError(f"unknown budget order '{order}'")
+    if cache is not None:
+        from .cache import file_fingerprint
+
+    stats: List[Optional[os.stat_result]] = []
+    for entry in entries:
+        try:
+            stats.append(entry.abs_path.stat())
+        except OSError:
+            stats.append(None)
+
+    def priority(index: int):
+        entry, st = entries[index], stats[index]
+        if order == "recent":
+            key = -st.st_mtime_ns if st is not None else 0
+        else:
+            key = entry.display_path.replace(os.sep, "/").count("/")
+        return (not entry.explicit, key, index)
+
+    ordered = sorted(range(len(entries)), key=priority)
+
+    def readable_size(index: int) -> int:
+        size = stats[index].st_size if stats[index] is not None else 0
+        limit = entries[index].read_limit
+        return size if limit is None else min(size, limit)
+
+    exact: Dict[int, int] = {}
+    records: Dict[int, FileRecord] = {}
+    if cache is not None:
+        for index in ordered:
+            if stats[index] is not None and entries[index].read_limit is None:
+                cached = cache.get(
+                    entries[index].abs_path, file_fingerprint(stats[index]), encoding
+                )
+                if cached is not None and cached["token_count"] is not None:
+                    exact[index] = cached["token_count"]
+
+    counted = 0
+    bytes_per_token = BYTES_PER_TOKEN_ESTIMATE
+    ceiling = budget * (1 + TOKEN_BUDGET_SLACK)
+    for _ in range(TOKEN_BUDGET_ROUNDS):
+        used = 0
+        to_read: List[int] = []
+        for index in ordered:
+            if index in exact:
+                cost = exact[index]
+            else:
+                cost = int(-(-readable_size(index) // bytes_per_token))
+            if used + cost > ceiling:
+                continue
+            used += cost
+            if index not in records:
+                to_read.append(index)
+        if not to_read:
+            break
+
+        read = list(read_entries([entries[index] for index in to_read], jobs))
+        texts = []
+        for index, record in zip(to_read, read):
+            records[index] = record
+            if record.error is not None:
+                # Unreadable files cost nothing; the error is reported on output.
+                exact[index] = 0
+            elif index in exact:
+                record.token_count = exact[index]
+            else:
+                texts.append((index, record))
+        counts = count_tokens_batch([record.content for _, record in texts], num_threads=jobs)
+        counted += len(texts)
+        for (index, record), token_count in zip(texts, counts):
+            record.token_count = token_count
+            exact[index] = token_count
+            if cache is not None and stats[index] is not None and record.entry.read_limit is None:
+                cache.put(
+                    record.entry.abs_path,
+                    file_fingerprint(stats[index]),
+                    encoding,
+                    get_text_stats(record.content),
+                    token_count,
+                )
+
+        sizes = sum(readable_size(index) for index, _ in texts)
+        tokens = sum(counts)
+        if sizes and tokens:
+            bytes_per_token = sizes / tokens
+
+    result = PackResult([], [])
+    kept: Set[int] = set()
+    for index in ordered:
+        if index in records and result.tokens + exact[index] <= budget:
+            result.tokens += exact[index]
+            kept.add(index)
+    result.records = [records[index] for index in sorted(kept)]
+    result.dropped = [entry for index, entry in enumerate(entries) if index not in kept]
+    result.counted = counted
+    return result
+
+
+def _read_entry(entry: FileEntry) -> FileRecord:
+    try:
+        content, detected_encoding = read_with_encoding(
+            entry.abs_path, max_bytes=entry.read_limit, tail=entry.read_tail
+        )
+    except Exception as e:
+        return FileRecord(entry, error=e)
+    return FileRecord(entry, content, detected_encoding)
+
+
+def read_entries(
+    entries: Sequence[FileEntry], jobs: Optional[int] = None
+) -> Iterator[FileRecord]:
+    """Read and decode text entries, yielding results in input order.
+
+    Files are read on a bounded thread pool so that syscalls and encoding
+    detection overlap, while at most ``2 * jobs`` results are held ahead of
+    the consumer. Errors are captured on the result instead of raised so the
+    caller can report them in order.
+
+    Args:
+        entries: File entries to read.
+        jobs: Number of worker threads; ``None`` picks a default based on the
+            CPU count and ``1`` reads serially.
+
+    Yields:
+        FileRecord for each entry, in the same order as ``entries``.
+    """
+    if jobs is None:
+        jobs = default_jobs()
+    if jobs <= 1 or len(entries) <= 1:
+        for entry in entries:
+            yield _read_entry(entry)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        for entry in entries:
+            pending.append(pool.submit(_read_entry, entry))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def default_jobs() -> int:
+    """Return the default number of worker threads for file reads."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _print_token_stats(
+    records: Sequence[FileRecord], cache=None, jobs: Optional[int] = None
+) -> None:
+    """Fill in and print statistics for records that were already read.
+
+    Text statistics come from ``record.content``; files are never read again.
+    Token counts for every file that needs one are computed in a single
+    multi-threaded batch. With a cache, unchanged files reuse the stored
+    statistics and skip tokenization.
+    """
+    if cache is not None:
+        from .cache import file_fingerprint
+
+    pending: List[Tuple[FileRecord, Optional[tuple]]] = []
+    for record in records:
+        if record.error is not None:
+            continue
+        entry = record.entry
+        try:
+            cached = None
+            fingerprint = None
+            # Statistics of a truncated read don't describe the file.
+            if (
+                cache is not None
+                and record.content is not None
+                and entry.read_limit is None
+            ):
+                fingerprint = file_fingerprint(entry.abs_path.stat())
+                cached = cache.get(entry.abs_path, fingerprint, encoding)
+
+            if cached is not None:
+                text_stats = cached["text_stats"]
+            elif record.content is not None:
+                text_stats = get_text_stats(record.content)
+            else:
+                text_stats = None
+            record.stats = get_file_stats(str(entry.abs_path), text_stats)
+
+            if not record.stats["is_binary"]:
+                if cached is not None:
+                    record.token_count = cached["token_count"]
+                elif record.token_count is None:
+                    # Already counted by --token-budget otherwise.
+                    pending.append((record, fingerprint))
+        except Exception as e:
+            record.error = e
+
+    if pending:
+        # Duplicates (--dedup) share their first copy's text; count it once.
+        texts = {id(record.content): record.content for record, _ in pending}
+        try:
+            unique_counts = dict(
+                zip(texts, count_tokens_batch(list(texts.values()), num_threads=jobs))
+            )
+            counts = [unique_counts[id(record.content)] for record, _ in pending]
+        except Exception as e:
+            for record, _ in pending:
+                record.error = e
+        else:
+            for (record, fingerprint), token_count in zip(pending, counts):
+                record.token_count = token_count
+                if fingerprint is not None:
+                    cache.put(
+                        record.entry.abs_path,
+                        fingerprint,
+                        encoding,
+                        {key: record.stats[key] for key in TEXT_STAT_KEYS},
+                        token_count,
+                    )
+
+    for record in records:
+        entry = record.entry
+        if isinstance(record.error, FileNotFoundError):
+            print(f"Error: File '{entry.display_path}' not found")
+        elif record.error is not None:
+            print(f"Error processing {entry.display_path}: {record.error}")
+        else:
+            print(format_file_stats(entry.display_path, record.stats, record.token_count))
+
+
 def main():  # pragma: no cover
     parser = argparse.ArgumentParser(
         description="Copy file contents, images, or STDIN input to clipboard."
@@ -232,42 +904,272 @@ def main():  # pragma: no cover
         action="store_true",
         help="Like --paste, but append to the target files instead of overwriting",
     )
+    parser.add_argument(
+        "--paste-compressed",
+        action="store_true",
+        help="Like --paste, but carry the files as a gzipped, base64-encoded tar that the script unpacks (works with --append)",
+    )
     parser.add_argument(
         "-t", "--tokens", action="store_true", help="Display token statistics for the file"
     )
     parser.add_argument(
         "--image", action="store_true", help="Include image files discovered in directories"
     )
+    parser.add_argument(
+        "--image-max-dim",
+        type=int,
+        metavar="PIXELS",
+        help="Scale images down so neither side exceeds PIXELS before copying",
+    )
+    parser.add_argument(
+        "--image-max-bytes",
+        type=_size_argument,
+        metavar="SIZE",
+        help="Scale images down until the copied PNG is at most SIZE, e.g. 5M",
+    )
+    parser.add_argument(
+        "--git",
+        action="store_true",
+        help="List files in directories from the git index (tracked files only) instead of walking them",
+    )
+    parser.add_argument(
+        "--untracked",
+        action="store_true",
+        help="With --git, also include untracked files that are not ignored (implies --git)",
+    )
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="Only copy files that differ from git HEAD (or --changed-ref), including untracked files",
+    )
+    parser.add_argument(
+        "--changed-ref",
+        metavar="REF",
+        help="Compare with git REF instead of HEAD (implies --changed)",
+    )
+    parser.add_argument(
+        "--since-last",
+        action="store_true",
+        help="Only copy files that are new or modified since the last --since-last run with the same arguments",
+    )
+    parser.add_argument(
+        "--include-binary",
+        action="store_true",
+        help="Copy files whose content looks binary instead of skipping them",
+    )
+    parser.add_argument(
+        "--list-skipped",
+        action="store_true",
+        help="List each binary file that was skipped and why",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Copy files with identical content once; later copies become a reference to the first",
+    )
+    parser.add_argument(
+        "--max-file-size",
+        type=_size_argument,
+        metavar="SIZE",
+        help="Budget for a single file, e.g. 512K or 2M (checked with stat before reading)",
+    )
+    parser.add_argument(
+        "--max-total-bytes",
+        type=_size_argument,
+        metavar="SIZE",
+        help="Budget for all copied files together, e.g. 20M",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        metavar="N",
+        help=f"Budget for all copied files in tokens, estimated at {BYTES_PER_TOKEN_ESTIMATE:g} bytes per token",
+    )
+    parser.add_argument(
+        "--budget-policy",
+        choices=BUDGET_POLICIES,
+        default="skip",
+        help="What to do with a file over budget: skip it, keep its head or tail, or stop (default: skip)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        metavar="N",
+        help="Copy only the files that fit in N tokens, counted exactly; explicit files are taken first",
+    )
+    parser.add_argument(
+        "--budget-order",
+        choices=BUDGET_ORDERS,
+        default="depth",
+        help="Priority of discovered files for --token-budget: shallowest paths or most recently modified first (default: depth)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of threads used to read files and count tokens (default: based on CPU count)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or update the token statistics cache",
+    )
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Write the text to standard output instead of the clipboard (messages go to stderr)",
+    )
+    destination.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        help="Write the text to FILE (or a named pipe) instead of the clipboard",
+    )
     parser.add_argument("--debug", action="store_true", help="Enable debug mode")
     args = parser.parse_args()
-
-    # Check dependencies before proceeding
-    missing_dependencies = check_dependencies()
-    if missing_dependencies:
-        print("Missing dependencies:")
-        for dep in missing_dependencies:
-            print(f"- {dep}")
-        install_dependencies()
-        return
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.max_tokens is not None and args.max_tokens < 0:
+        parser.error("--max-tokens must not be negative")
+    if args.image_max_dim is not None and args.image_max_dim < 1:
+        parser.error("--image-max-dim must be at least 1")
+    if args.token_budget is not None and args.token_budget < 0:
+        parser.error("--token-budget must not be negative")
 
     if args.version:
         print(f"copybuffer version {__VERSION__}")
         return
 
+    try:
+        sink = open_sink(args.stdout, args.output)
+    except OutputError as e:
+        print(f"Error: {e}")
+        return
+
+    # With --stdout the copied text owns stdout; everything else goes to stderr.
+    with contextlib.redirect_stdout(sys.stderr) if args.stdout else contextlib.nullcontext():
+        _run(args, sink)
+
+
+def _write_output(
+    args,
+    sink: Sink,
+    items,
+    subject: str,
+    paste: bool = False,
+    clipboard_name: str = "clipboard",
+    chunks: Optional[Iterable[str]] = None,
+) -> int:
+    """Stream ``(path, contents)`` items into ``sink``, close it and report.
+
+    With ``chunks``, that text is streamed as a single unnamed block instead
+    of ``items``.
+
+    Returns the number of files written, or 0 if the output failed.
+    """
+    if args.verbose:
+        sink = CaptureSink(sink)
+    try:
+        with sink:
+            if chunks is not None:
+                written = write_text_stream(sink, chunks)
+            elif paste and args.paste_compressed:
+                written = write_compressed_script(sink, items, append=args.append)
+            elif paste:
+                written = write_heredoc_script(sink, items, append=args.append)
+            else:
+                written = write_file_contents(
+                    sink, items, args.include_header, args.attachment, args.debug
+                )
+    except OutputError as e:
+        print(f"Error: {e}")
+        return 0
+    except _StdinReadError as e:
+        print(f"Error reading from STDIN: {e}")
+        return 0
+    except Exception as e:
+        print(f"Error: An unexpected error occurred. {str(e)}")
+        return 0
+    if not written:
+        return 0
+    if sink.description == "clipboard":
+        print(f"{subject} copied to {clipboard_name} successfully!")
+    else:
+        print(f"{subject} written to {sink.description} successfully!")
+    if args.verbose:
+        label = "Copied heredoc script" if paste else "Copied contents"
+        print(f"{label}:\n" + sink.getvalue())
+    return written
+
+
+def _stdin_limit(args) -> Optional[int]:
+    """Return the input cap for STDIN from the size and token budgets, if any."""
+    limits = [args.max_file_size, args.max_total_bytes]
+    if args.max_tokens is not None:
+        limits.append(int(args.max_tokens * BYTES_PER_TOKEN_ESTIMATE))
+    limits = [limit for limit in limits if limit is not None]
+    return min(limits) if limits else None
+
+
+class _StdinReadError(Exception):
+    """Wraps an error raised while STDIN is streamed into a sink."""
+
+
+def _stdin_chunks(reader: StdinReader) -> Iterator[str]:
+    try:
+        yield from strip_chunks(reader)
+    except (OSError, ValueError, LookupError) as e:
+        raise _StdinReadError(e) from e
+
+
+def _report_stdin_truncation(args, reader: StdinReader) -> None:
+    if reader.truncated:
+        print(f"STDIN truncated to its first {_format_size(reader.max_bytes)} (budget reached)")
+
+
+def _run(args, sink: Sink) -> None:
+    if isinstance(sink, ClipboardSink):
+        # Check dependencies before proceeding
+        missing_dependencies = check_dependencies(get_clipboard_backend())
+        if missing_dependencies:
+            print("Missing dependencies:")
+            for dep in missing_dependencies:
+                print(f"- {dep}")
+            install_dependencies(missing_dependencies)
+            return
+
     # If no files provided, check STDIN
     if not args.files:
-        if args.paste or args.append:
-            print("Error: --paste/--append require file paths to determine output destinations.")
+        if args.paste or args.append or args.paste_compressed:
+            print(
+                "Error: --paste/--paste-compressed/--append require file paths to determine output destinations."
+            )
             return
+        reader = StdinReader(max_bytes=_stdin_limit(args))
+        if not (args.tokens or args.verbose or args.debug):
+            # Nothing needs the whole text, so pass it on as it is decoded.
+            _write_output(
+                args,
+                sink,
+                None,
+                "STDIN",
+                clipboard_name="the clipboard",
+                chunks=_stdin_chunks(reader),
+            )
+            _report_stdin_truncation(args, reader)
+            return
+
         try:
-            content, detected_encoding = read_stdin_with_encoding()
-            content = content.strip()
+            content = "".join(strip_chunks(reader))
             if args.debug:
-                print(f"Debug: Read from STDIN (encoding: {detected_encoding}): {content}")
+                print(f"Debug: Read from STDIN (encoding: {reader.encoding}): {content}")
         except Exception as e:
             print(f"Error reading from STDIN: {e}")
             return
-        
+        _report_stdin_truncation(args, reader)
+
         # Handle token counting for STDIN
         if args.tokens:
             # Calculate text statistics
@@ -277,9 +1179,7 @@ def main():  # pragma: no cover
             char_no_spaces = len(content.replace(' ', '').replace('\n', '').replace('\r', ''))
             
             # Calculate token count
-            enc = tiktoken.get_encoding(encoding)
-            tokens = enc.encode(content)
-            token_count = len(tokens)
+            token_count = count_tokens(content)
             
             # Display statistics
             avg_line_length = char_count / len(lines) if lines else 0.00
@@ -304,17 +1204,19 @@ def main():  # pragma: no cover
             ]
             print('\n'.join(output))
         
-        combined_contents = copy_file_contents_to_clipboard(
-            [content], args.include_header, args.attachment, debug=args.debug
-        )
-        if combined_contents:
-            print("STDIN copied to the clipboard successfully!")
-            if args.verbose:
-                print("Copied contents:\n" + combined_contents)
+        _write_output(args, sink, [(None, content)], "STDIN", clipboard_name="the clipboard")
         return
 
     text_entries, image_entries, missing, directory_errors = discover_files(
-        args.files, args.directory, args.recursive, args.image, debug=args.debug
+        args.files,
+        args.directory,
+        args.recursive,
+        args.image,
+        debug=args.debug,
+        use_git=args.git or args.untracked,
+        include_untracked=args.untracked,
+        # Never copy the output file into itself.
+        exclude=[sink.path] if isinstance(sink, FileSink) else (),
     )
 
     for missing_path in missing:
@@ -325,81 +1227,220 @@ def main():  # pragma: no cover
             f"Error: Directory '{directory_path}' requires --directory (-d) or --recursive (-r)."
         )
 
-    file_contents_list: List[str] = []
-    valid_file_paths: List[str] = []
-    for entry in text_entries:
+    # Narrow the entries before anything is read.
+    snapshot = None
+    if args.since_last:
+        from .cache import RunSnapshot
+
+        snapshot = RunSnapshot(
+            "\0".join([str(Path.cwd().resolve()), *sorted(args.files)])
+        )
+        text_entries, text_fingerprints = filter_since_last(text_entries, snapshot)
+        image_entries, image_fingerprints = filter_since_last(image_entries, snapshot)
+    changed_ref = args.changed_ref or ("HEAD" if args.changed else None)
+    if changed_ref is not None:
         try:
-            file_content, detected_encoding = read_with_encoding(entry.abs_path)
-            file_content = file_content.strip()
-            if args.debug:
-                print(f"Debug: Read file {entry.abs_path} (encoding: {detected_encoding})")
-        except FileNotFoundError:
-            print(f"Error: File '{entry.display_path}' not found")
-            continue
-        except Exception as e:
-            print(f"Error reading {entry.display_path}: {e}")
-            continue
+            text_entries = filter_changed(text_entries, changed_ref, args.debug)
+            image_entries = filter_changed(image_entries, changed_ref, args.debug)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    if (changed_ref is not None or args.since_last) and not (text_entries or image_entries):
+        print("No changed files to copy.")
 
-        file_contents_list.append(file_content)
-        valid_file_paths.append(entry.display_path)
-        if args.debug:
-            print(f"Debug: Read file {entry.abs_path}")
+    if not args.include_binary:
+        text_entries, skipped = filter_binary_entries(text_entries, args.jobs)
+        if args.list_skipped:
+            for entry, reason in skipped:
+                print(f"Skipped binary file '{entry.display_path}' ({reason})")
+        if skipped:
+            hint = "" if args.list_skipped else " (use --list-skipped to list them)"
+            print(f"Skipped {len(skipped)} binary file{'s' if len(skipped) != 1 else ''}{hint}")
+
+    all_text_entries = text_entries
+    if args.dedup:
+        if args.append and not args.paste_compressed:
+            # An appended-to file can't be copied to recreate its duplicates.
+            print("Note: --dedup is ignored with --append; use --paste-compressed to combine them")
+        else:
+            text_entries, duplicates = find_duplicates(text_entries, args.jobs)
+            if args.list_skipped:
+                for entry in duplicates:
+                    print(
+                        f"Duplicate '{entry.display_path}' (same content as '{entry.duplicate_of.display_path}')"
+                    )
+            if duplicates:
+                saved = sum(entry.size for entry in duplicates)
+                print(
+                    f"Deduplicated {len(duplicates)} file{'s' if len(duplicates) != 1 else ''}"
+                    f" ({_format_size(saved)} not copied again)"
+                )
+
+    if (
+        args.max_file_size is not None
+        or args.max_total_bytes is not None
+        or args.max_tokens is not None
+    ):
+        budget = apply_budgets(
+            text_entries,
+            args.max_file_size,
+            args.max_total_bytes,
+            args.max_tokens,
+            args.budget_policy,
+        )
+        text_entries = budget.kept
+        if args.list_skipped:
+            for entry, reason in budget.dropped:
+                print(f"Skipped '{entry.display_path}' ({reason})")
+            for entry in budget.truncated:
+                side = "last" if entry.read_tail else "first"
+                print(
+                    f"Truncated '{entry.display_path}' to its {side} {_format_size(entry.read_limit)}"
+                )
+        if budget.dropped or budget.truncated:
+            print(
+                f"Budget: dropped {len(budget.dropped)} file{'s' if len(budget.dropped) != 1 else ''}, "
+                f"truncated {len(budget.truncated)}, "
+                f"{_format_size(budget.dropped_bytes)} left out"
+                f" (~{estimate_token_count(budget.dropped_bytes):,} tokens)"
+            )
+
+    packed = None
+    if args.token_budget is not None:
+        cache = None
+        if not args.no_cache:
+            from .cache import StatsCache
+
+            cache = StatsCache()
+        try:
+            packed = pack_token_budget(
+                text_entries, args.token_budget, args.budget_order, cache, args.jobs
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+        text_entries = [record.entry for record in packed.records]
+        if args.list_skipped:
+            for entry in packed.dropped:
+                print(f"Skipped '{entry.display_path}' (over the token budget)")
+        dropped = len(packed.dropped)
+        print(
+            f"Token budget: {packed.tokens:,} of {args.token_budget:,} tokens in "
+            f"{len(packed.records)} file{'s' if len(packed.records) != 1 else ''}, "
+            f"dropped {dropped} file{'s' if dropped != 1 else ''}"
+            f" ({packed.counted} tokenized)"
+        )
 
+    # Images go to the clipboard before the text is streamed, so text copied
+    # to the clipboard still ends up as its final contents.
     for image_entry in image_entries:
+        if not isinstance(sink, ClipboardSink):
+            print(
+                f"Skipping image '{image_entry.display_path}': images can only be copied to the clipboard"
+            )
+            continue
         if args.debug:
             print(f"Debug: Processing image {image_entry.abs_path}")
-        if copy_image_to_clipboard(str(image_entry.abs_path)):
+        if copy_image_to_clipboard(
+            str(image_entry.abs_path),
+            max_dim=args.image_max_dim,
+            max_bytes=args.image_max_bytes,
+        ):
             print(
                 f"Image '{image_entry.display_path}' copied to clipboard successfully!"
             )
 
-    if file_contents_list:
-        if args.paste or args.append:
-            script_text = generate_heredoc_script(
-                valid_file_paths, file_contents_list, append=args.append
+    # Duplicates follow their first copy through the budgets.
+    kept = {id(entry) for entry in text_entries}
+    output_entries = [
+        entry
+        for entry in all_text_entries
+        if id(entry if entry.duplicate_of is None else entry.duplicate_of) in kept
+    ]
+    originals = {id(entry.duplicate_of) for entry in output_entries if entry.duplicate_of}
+
+    records: List[FileRecord] = []
+
+    def readable_files() -> Iterator[Tuple[str, str]]:
+        # Records are only kept for --tokens; otherwise each file's text can
+        # be released as soon as it has been written to the sink.
+        source = iter(
+            packed.records if packed is not None else read_entries(text_entries, args.jobs)
+        )
+        # id of a first copy -> (display path, record) of the copy written.
+        delivered: Dict[int, Tuple[str, Optional[FileRecord]]] = {}
+        for entry in output_entries:
+            original = entry.duplicate_of
+            if original is None:
+                record = next(source)
+            elif id(original) in delivered:
+                written_path, first = delivered[id(original)]
+                if args.tokens:
+                    records.append(
+                        FileRecord(entry, first.content, first.encoding, token_count=first.token_count)
+                    )
+                yield entry.display_path, DuplicateOf(written_path)
+                continue
+            else:
+                # The first copy could not be read; read this one instead.
+                record = _read_entry(entry)
+            if args.tokens:
+                records.append(record)
+            if isinstance(record.error, FileNotFoundError):
+                print(f"Error: File '{entry.display_path}' not found")
+                continue
+            if record.error is not None:
+                print(f"Error reading {entry.display_path}: {record.error}")
+                continue
+            if args.debug:
+                print(f"Debug: Read file {entry.abs_path} (encoding: {record.encoding})")
+            group = id(entry) if original is None else id(original)
+            if group in originals:
+                delivered[group] = (entry.display_path, record if args.tokens else None)
+            yield entry.display_path, record.content.strip()
+
+    written = 0
+    if output_entries:
+        if args.paste_compressed:
+            written = _write_output(
+                args, sink, readable_files(), "Compressed paste script", paste=True
             )
-            try:
-                pyperclip.copy(script_text)
-                if args.verbose:
-                    print("Copied heredoc script:\n" + script_text)
-                print("Heredoc script copied to clipboard successfully!")
-            except Exception as e:
-                print(f"Error: An unexpected error occurred. {str(e)}")
+        elif args.paste or args.append:
+            written = _write_output(args, sink, readable_files(), "Heredoc script", paste=True)
         else:
-            combined_contents = copy_file_contents_to_clipboard(
-                file_contents_list,
-                args.include_header,
-                args.attachment,
-                valid_file_paths,
-                args.debug,
-            )
-            if combined_contents:
-                print("Files copied to clipboard successfully!")
-                if args.verbose:
-                    print("Copied contents:\n" + combined_contents)
+            written = _write_output(args, sink, readable_files(), "Files")
+
+    # Only move the snapshot forward once the changed files were delivered.
+    if snapshot is not None and (written or not output_entries):
+        snapshot.save(text_fingerprints + image_fingerprints)
 
-    all_entries = text_entries + image_entries
     if args.tokens:
-        if not all_entries:
+        records.extend(FileRecord(entry) for entry in image_entries)
+        if not records:
             return
-        enc = tiktoken.get_encoding(encoding)
-        for entry in all_entries:
-            try:
-                stats = get_file_stats(str(entry.abs_path))
-                token_count = None
-
-                if not stats["is_binary"]:
-                    content, detected_encoding = read_with_encoding(entry.abs_path)
-                    tokens = enc.encode(content)
-                    token_count = len(tokens)
+        cache = None
+        if not args.no_cache:
+            from .cache import StatsCache
 
-                print(format_file_stats(entry.display_path, stats, token_count))
-
-            except FileNotFoundError:
-                print(f"Error: File '{entry.display_path}' not found")
-            except Exception as e:
-                print(f"Error processing {entry.display_path}: {e}")
+            cache = StatsCache()
+        try:
+            _print_token_stats(records, cache, args.jobs)
+        finally:
+            if cache is not None:
+                cache.close()
         return
 
 
-__all__ = ["main", "discover_files"]
+__all__ = [
+    "main",
+    "discover_files",
+    "filter_binary_entries",
+    "filter_changed",
+    "find_duplicates",
+    "apply_budgets",
+    "pack_token_budget",
+    "parse_size",
+    "filter_since_last",
+    "read_entries",
+    "FileRecord",
+]
@@ -0,0 +1,529 @@
+"""Output sinks that copied text is streamed into.
+
+A sink receives the output piece by piece as files are read, so text can
+reach its destination before the last file has been read. The clipboard
+sink pipes into the backend's copy tool; the stream and file sinks write to
+stdout, a regular file or a named pipe with memory bounded by the largest
+file rather than the whole payload.
+"""
+
+import base64
+import io
+import os
+import stat
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import pyperclip
+
+from .core import (
+    HEREDOC_SHEBANG,
+    ClipboardBackend,
+    DuplicateOf,
+    _open_clipboard_process,
+    _write_text,
+    clipboard_unavailable_message,
+    format_duplicate_block,
+    format_file_block,
+    get_clipboard_backend,
+    _shell_single_quote,
+    heredoc_file_block,
+)
+
+
+class OutputError(Exception):
+    """Raised when a sink cannot deliver its output."""
+
+
+class Sink:
+    """Base class for output sinks.
+
+    Sinks are used as context managers: leaving the block normally closes
+    the sink (delivering the output), leaving it with an exception aborts it.
+    """
+
+    #: Human readable destination, used in status messages.
+    description = "output"
+
+    #: Number of characters written so far.
+    written = 0
+
+    def write(self, text: str) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Push buffered output to the destination; called after each file."""
+
+    def close(self) -> None:
+        """Finish the output."""
+
+    def abort(self) -> None:
+        """Discard the output after an error; defaults to :meth:`close`."""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ClipboardSink(Sink):
+    """Stream text into the clipboard backend's copy tool.
+
+    The tool is started on the first write and fed UTF-8 chunks as they
+    arrive. Written text is also kept until :meth:`close` so pyperclip can
+    take over when there is no tool or it fails; the clipboard has to hold
+    the whole payload anyway, so use a stream sink for bounded memory.
+
+    Args:
+        backend: Clipboard backend; defaults to :func:`get_clipboard_backend`
+    """
+
+    description = "clipboard"
+
+    def __init__(self, backend: Optional[ClipboardBackend] = None):
+        self.backend = backend
+        self._parts = []
+        self._process = None
+        self._failed = False
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self._parts.append(text)
+        self.written += len(text)
+        if self._failed:
+            return
+        if self._process is None:
+            if self.backend is None:
+                self.backend = get_clipboard_backend()
+            self._process = _open_clipboard_process(self.backend)
+            if self._process is None:
+                self._failed = True
+                return
+        try:
+            _write_text(self._process.stdin, text)
+        except BrokenPipeError:
+            self._failed = True
+
+    def close(self) -> None:
+        process, self._process = self._process, None
+        parts, self._parts = self._parts, []
+        if not parts:
+            return
+        if process is not None:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                self._failed = True
+            if process.wait() != 0:
+                self._failed = True
+        if self._failed:
+            try:
+                pyperclip.copy("".join(parts))
+            except pyperclip.PyperclipException as e:
+                raise OutputError(clipboard_unavailable_message()) from e
+
+    def abort(self) -> None:
+        process, self._process = self._process, None
+        self._parts = []
+        if process is not None:
+            process.kill()
+            process.wait()
+
+
+class StreamSink(Sink):
+    """Write UTF-8 text to a binary stream such as ``sys.stdout.buffer``.
+
+    The stream is flushed after every file and left open on close.
+
+    Args:
+        stream: Binary stream to write to
+        description: Name of the destination for status messages
+    """
+
+    def __init__(self, stream, description: str = "stdout"):
+        self.stream = stream
+        self.description = description
+
+    def write(self, text: str) -> None:
+        try:
+            _write_text(self.stream, text)
+        except OSError as e:
+            raise OutputError(f"Cannot write to {self.description}: {e}") from e
+        self.written += len(text)
+
+    def flush(self) -> None:
+        try:
+            self.stream.flush()
+        except OSError as e:
+            raise OutputError(f"Cannot write to {self.description}: {e}") from e
+
+    def close(self) -> None:
+        self.flush()
+
+
+class FileSink(StreamSink):
+    """Write UTF-8 text to a file or named pipe, replacing its contents.
+
+    Nothing is opened until the first write. A regular file is then written
+    as a temporary file in the same directory that :meth:`close` renames
+    over it, so an aborted run, or one that writes nothing, leaves the old
+    file in place. Named pipes and devices are opened directly; opening a
+    named pipe blocks until a reader has opened the other end.
+
+    Args:
+        path: Destination path
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        super().__init__(None, str(path))
+        # Follow symlinks, so the rename replaces the file they point to.
+        self.path = Path(os.path.realpath(path))
+        self._temp_path: Optional[Path] = None
+
+    def _open(self) -> None:
+        try:
+            try:
+                mode = os.stat(self.path).st_mode
+            except FileNotFoundError:
+                mode = None
+            if mode is not None and not stat.S_ISREG(mode):
+                self.stream = open(self.path, "wb")
+                return
+            temp_path = self.path.with_name(f".{self.path.name}.{os.urandom(4).hex()}.tmp")
+            flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+            # Created like open() would create the file, honouring the umask.
+            fd = os.open(temp_path, flags, 0o666)
+            self._temp_path = temp_path
+            if mode is not None:
+                os.chmod(temp_path, stat.S_IMODE(mode))
+            self.stream = os.fdopen(fd, "wb")
+        except OSError as e:
+            self._discard()
+            raise OutputError(f"Cannot open '{self.description}' for writing: {e}") from e
+
+    def _discard(self) -> None:
+        temp_path, self._temp_path = self._temp_path, None
+        if temp_path is not None:
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
+
+    def write(self, text: str) -> None:
+        if self.stream is None:
+            self._open()
+        super().write(text)
+
+    def flush(self) -> None:
+        if self.stream is not None:
+            super().flush()
+
+    def close(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            super().close()
+        except OutputError:
+            self.abort()
+            raise
+        self.stream.close()
+        if self._temp_path is not None:
+            try:
+                os.replace(self._temp_path, self.path)
+            except OSError as e:
+                self._discard()
+                raise OutputError(f"Cannot write to {self.description}: {e}") from e
+            self._temp_path = None
+
+    def abort(self) -> None:
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except OSError:
+                pass
+        self._discard()
+
+
+class CaptureSink(Sink):
+    """Forward writes to another sink and keep a copy of the text.
+
+    Used for ``--verbose``, which prints the copied text after the fact.
+    """
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.description = sink.description
+        self._parts = []
+
+    def write(self, text: str) -> None:
+        self.sink.write(text)
+        self._parts.append(text)
+        self.written += len(text)
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def close(self) -> None:
+        self.sink.close()
+
+    def abort(self) -> None:
+        self.sink.abort()
+
+    def getvalue(self) -> str:
+        return "".join(self._parts)
+
+
+def open_sink(stdout: bool = False, output: Union[Path, str, None] = None) -> Sink:
+    """Return the sink for the requested destination.
+
+    Args:
+        stdout: Write to standard output
+        output: Write to this file or named pipe
+
+    Returns:
+        A StreamSink, FileSink or (by default) ClipboardSink.
+
+    Raises:
+        OutputError: If ``output`` cannot be opened
+    """
+    if stdout:
+        return StreamSink(sys.stdout.buffer)
+    if output is not None:
+        return FileSink(output)
+    return ClipboardSink()
+
+
+def write_file_contents(
+    sink: Sink,
+    items: Iterable[Tuple[Optional[str], str]],
+    include_header: bool = False,
+    discord_attachment: bool = False,
+    debug: bool = False,
+) -> int:
+    """Write file blocks to a sink as the items are produced.
+
+    This is the streaming form of ``copy_file_contents_to_clipboard`` and
+    writes exactly the same text.
+
+    Args:
+        sink: Destination sink
+        items: ``(file_path, contents)`` pairs; ``file_path`` may be None.
+            ``contents`` may be a ``DuplicateOf``, written as a reference
+        include_header: Add a ``=== File: ... ===`` header per file
+        discord_attachment: Wrap each file as a Discord attachment
+        debug: Print each file's block as it is written
+
+    Returns:
+        Number of files written.
+    """
+    count = 0
+    for file_path, contents in items:
+        if isinstance(contents, DuplicateOf):
+            block = format_duplicate_block(file_path, contents.path, discord_attachment)
+        else:
+            block = format_file_block(contents, file_path, include_header, discord_attachment)
+        for part in block:
+            sink.write(part)
+        sink.flush()
+        count += 1
+        if debug:
+            print(f"Debug: Added contents of file {count}:\n{''.join(block)}")
+    return count
+
+
+def write_text_stream(sink: Sink, chunks: Iterable[str]) -> int:
+    """Write text to a sink piece by piece, as an unnamed file block.
+
+    Writes the same text as ``write_file_contents`` with a single
+    ``(None, "".join(chunks))`` item, flushing after every chunk so readers
+    of a stream or pipe see the text as it arrives.
+
+    Returns:
+        1, the number of blocks written.
+    """
+    for chunk in chunks:
+        sink.write(chunk)
+        sink.flush()
+    sink.write("\n")
+    sink.flush()
+    return 1
+
+
+def write_heredoc_script(
+    sink: Sink, items: Iterable[Tuple[str, str]], append: bool = False
+) -> int:
+    """Write a heredoc script to a sink as the items are produced.
+
+    This is the streaming form of ``generate_heredoc_script`` and writes
+    exactly the same text. Nothing is written when ``items`` is empty.
+
+    Args:
+        sink: Destination sink
+        items: ``(file_path, contents)`` pairs; a ``DuplicateOf`` as
+            ``contents`` copies the earlier file with ``cp``
+        append: If True, the script appends to files instead of overwriting
+
+    Returns:
+        Number of files written.
+
+    Raises:
+        ValueError: If ``append`` is set and an item is a ``DuplicateOf``,
+            since the earlier file no longer holds just the pasted text.
+    """
+    count = 0
+    for file_path, contents in items:
+        if not count:
+            sink.write(HEREDOC_SHEBANG)
+        if isinstance(contents, DuplicateOf):
+            if append:
+                raise ValueError("duplicates cannot be referenced when appending")
+            quoted_path = _shell_single_quote(file_path)
+            block = (
+                f"\nmkdir -p \"$(dirname -- {quoted_path})\"\n"
+                f"cp -- {_shell_single_quote(contents.path)} {quoted_path}\n",
+            )
+        else:
+            block = heredoc_file_block(file_path, contents, append)
+        for part in block:
+            sink.write(part)
+        sink.flush()
+        count += 1
+    return count
+
+
+#: Terminates the base64 payload; ``_`` is not in the base64 alphabet.
+PAYLOAD_DELIMITER = "EOF_CB_PAYLOAD"
+
+#: gzip level for --paste-compressed; 6 is zlib's speed/size default.
+PAYLOAD_COMPRESS_LEVEL = 6
+
+_BASE64_LINE_BYTES = 57  # encodes to 76 characters, like base64(1)
+
+
+class _Base64LineWriter(io.RawIOBase):
+    """Binary file object that base64-encodes into a sink, 76 columns per line."""
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.pending = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.pending += data
+        whole = len(self.pending) - len(self.pending) % _BASE64_LINE_BYTES
+        if whole:
+            self.sink.write(base64.encodebytes(self.pending[:whole]).decode("ascii"))
+            del self.pending[:whole]
+        return len(data)
+
+    def finish(self) -> None:
+        if self.pending:
+            self.sink.write(base64.encodebytes(self.pending).decode("ascii"))
+            self.pending.clear()
+
+
+def write_compressed_script(
+    sink: Sink, items: Iterable[Tuple[str, str]], append: bool = False
+) -> int:
+    """Write a script that recreates the files from a gzipped tar payload.
+
+    The files are packed as they are produced into a tar stream, gzipped and
+    base64-encoded into a heredoc that the script decodes with
+    ``base64 -d | tar -xzf -`` into a temporary directory. Only if that
+    succeeds is each file written to its destination, with the same quoting,
+    ``mkdir -p`` and ``>``/``>>`` redirection as the heredoc script, so the
+    result is identical to pasting ``write_heredoc_script`` output; a payload
+    mangled in transit leaves existing files untouched. Nothing is written
+    when ``items`` is empty.
+
+    Args:
+        sink: Destination sink
+        items: ``(file_path, contents)`` pairs; a ``DuplicateOf`` as
+            ``contents`` reuses the earlier file's tar member
+        append: If True, the script appends to files instead of overwriting
+
+    Returns:
+        Number of files written.
+    """
+    # Only --paste-compressed needs these; importing them here keeps startup fast.
+    import gzip
+    import tarfile
+
+    redir = ">>" if append else ">"
+    targets = []
+    members: Dict[str, int] = {}
+    encoder = archive = tar = None
+    for file_path, contents in items:
+        if tar is None:
+            sink.write(
+                f"{HEREDOC_SHEBANG}\n"
+                'cb_payload="$(mktemp -d)"\n'
+                f"if base64 -d << '{PAYLOAD_DELIMITER}' | tar -xzf - -C \"$cb_payload\"\n"
+            )
+            encoder = _Base64LineWriter(sink)
+            archive = gzip.GzipFile(
+                fileobj=encoder, mode="wb", compresslevel=PAYLOAD_COMPRESS_LEVEL, mtime=0
+            )
+            tar = tarfile.open(fileobj=archive, mode="w|")
+        if isinstance(contents, DuplicateOf):
+            targets.append((_shell_single_quote(file_path), members[contents.path]))
+            continue
+        # A heredoc ends its body with a newline; keep the files identical.
+        data = (contents + "\n").encode("utf-8", "replace")
+        # Members are numbered so unusual paths never reach tar.
+        members[file_path] = len(members)
+        info = tarfile.TarInfo(str(members[file_path]))
+        info.size = len(data)
+        info.mode = 0o644
+        tar.addfile(info, io.BytesIO(data))
+        sink.flush()
+        targets.append((_shell_single_quote(file_path), members[file_path]))
+    if tar is None:
+        return 0
+    tar.close()
+    archive.close()
+    encoder.finish()
+
+    sink.write(f"{PAYLOAD_DELIMITER}\nthen\n")
+    for quoted_path, index in targets:
+        sink.write(
+            f"    mkdir -p \"$(dirname -- {quoted_path})\"\n"
+            f"    cat {redir} {quoted_path} < \"$cb_payload/{index}\"\n"
+        )
+    # No exit on failure, since the script is usually pasted into a live
+    # shell; ``false`` still makes the script's status non-zero.
+    sink.write(
+        '    rm -rf -- "$cb_payload"\n'
+        "else\n"
+        '    rm -rf -- "$cb_payload"\n'
+        "    echo 'cb: could not unpack the payload; no files were written' >&2\n"
+        "    false\n"
+        "fi\n"
+    )
+    sink.flush()
+    return len(targets)
+
+
+__all__ = [
+    "CaptureSink",
+    "ClipboardSink",
+    "FileSink",
+    "OutputError",
+    "PAYLOAD_DELIMITER",
+    "Sink",
+    "StreamSink",
+    "open_sink",
+    "write_compressed_script",
+    "write_file_contents",
+    "write_heredoc_script",
+    "write_text_stream",
+]
@@ -0,0 +1,20 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+
+
+@pytest.fixture(autouse=True)
+def isolated_clipboard_backend(tmp_path_factory, monkeypatch):
+    """Give each test a fresh backend probe and a private cache directory.
+
+    Clipboard tools are reported as absent unless a test patches
+    ``shutil.which`` itself, so text copies fall through to (patchable)
+    pyperclip instead of touching the developer's real clipboard.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("xdg-cache")))
+    monkeypatch.setattr(core, "_CLIPBOARD_BACKEND", None)
+    monkeypatch.setattr(core.shutil, "which", lambda cmd: None)
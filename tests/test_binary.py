@@ -0,0 +1,77 @@
+"""Tests for binary content sniffing.
+
+Expected results:
+- Text in common encodings (including BOM-less UTF-16 and ANSI-coloured
+  logs) is not flagged.
+- Known signatures, NUL bytes and control-character noise are flagged.
+- filter_binary_entries only reads a prefix and keeps input order.
+"""
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+from copybuffer.main import FileEntry, filter_binary_entries
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"plain ascii\n",
+        "café naïve\n".encode("utf-8"),
+        "café naïve\n".encode("latin-1"),
+        "\ufeffbom text\n".encode("utf-16"),
+        ("utf-16 without a bom\n" * 50).encode("utf-16-le"),
+        ("utf-16 without a bom\n" * 50).encode("utf-16-be"),
+        b"\x1b[31mERROR\x1b[0m something failed\n" * 20,
+        b"col1\tcol2\r\ncol3\tcol4\r\n\f",
+    ],
+)
+def test_text_is_not_binary(data):
+    assert core.sniff_binary(data) is None
+
+
+@pytest.mark.parametrize(
+    "data, reason",
+    [
+        (b"\x7fELF\x02\x01\x01" + b"\x00" * 100, "ELF binary"),
+        (b"PK\x03\x04" + b"rest", "zip archive"),
+        (b"\x1f\x8b\x08\x00", "gzip archive"),
+        (b"SQLite format 3\x00" + b"\x10\x00", "SQLite database"),
+        (b"%PDF-1.7\n", "PDF document"),
+        (b"a" * 257 + b"ustar\x0000", "tar archive"),
+        (b"\x03\xf3\r\n\x00\x00\x00\x00" + b"\xe3" * 50, "contains NUL bytes"),
+        (bytes(range(1, 32)) * 10, "control characters"),
+    ],
+)
+def test_binary_is_detected(data, reason):
+    assert core.sniff_binary(data) == reason
+
+
+def test_sniff_file_reads_only_a_prefix(tmp_path):
+    target = tmp_path / "big.txt"
+    target.write_bytes(b"text\n" * 10_000 + b"\x00")
+    assert core.sniff_file(target) is None
+    assert core.sniff_file(target, sample_size=60_000) == "contains NUL bytes"
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_filter_binary_entries_keeps_order(tmp_path, jobs):
+    entries = []
+    for index in range(12):
+        path = tmp_path / f"f{index:02d}"
+        path.write_bytes(b"\x00\x01binary" if index % 3 == 0 else b"text %d\n" % index)
+        entries.append(FileEntry(path, path.name))
+    entries.append(FileEntry(tmp_path / "missing", "missing"))
+
+    text, skipped = filter_binary_entries(entries, jobs)
+
+    assert [entry.display_path for entry in text] == [
+        entry.display_path for index, entry in enumerate(entries) if index % 3 or index == 12
+    ]
+    assert [entry.display_path for entry, _ in skipped] == ["f00", "f03", "f06", "f09"]
+    assert {reason for _, reason in skipped} == {"contains NUL bytes"}
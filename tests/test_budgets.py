@@ -0,0 +1,191 @@
+"""Tests for size limits and budget policies.
+
+Expected results:
+- Sizes accept plain byte counts and binary K/M/G suffixes.
+- skip drops files over budget and keeps going; stop drops the rest.
+- head/tail keep the part that fits and mark the entry for a truncated read.
+- Token budgets are converted to bytes with the per-token estimate.
+- pack_token_budget keeps explicit files first, then shallow or recent ones,
+  never exceeds the budget and only tokenizes files that could fit.
+"""
+
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+from copybuffer.cache import StatsCache
+from copybuffer.main import FileEntry, apply_budgets, pack_token_budget, parse_size
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("100", 100), ("2k", 2048), ("1.5M", 1536 * 1024), ("1GB", 1 << 30), ("7 KiB", 7168)],
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "-1", "ten", "5X"])
+def test_parse_size_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_size(value)
+
+
+@pytest.fixture
+def entries(tmp_path):
+    result = []
+    for name, size in [("a", 10), ("big", 100), ("b", 10), ("c", 10)]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        result.append(FileEntry(path, name))
+    return result
+
+
+def _names(entries):
+    return [entry.display_path for entry in entries]
+
+
+def test_skip_policy(entries):
+    result = apply_budgets(entries, max_file_size=50, max_total_bytes=25)
+
+    assert _names(result.kept) == ["a", "b"]
+    assert [(entry.display_path, reason) for entry, reason in result.dropped] == [
+        ("big", "larger than --max-file-size"),
+        ("c", "over the total budget"),
+    ]
+    assert result.dropped_bytes == 110
+    assert all(entry.read_limit is None for entry in result.kept)
+
+
+def test_stop_policy(entries):
+    result = apply_budgets(entries, max_file_size=50, policy="stop")
+
+    assert _names(result.kept) == ["a"]
+    assert [reason for _, reason in result.dropped] == [
+        "larger than --max-file-size",
+        "stopped at budget",
+        "stopped at budget",
+    ]
+
+
+@pytest.mark.parametrize("policy", ["head", "tail"])
+def test_truncating_policies(entries, policy):
+    result = apply_budgets(entries, max_file_size=50, max_total_bytes=65, policy=policy)
+
+    assert _names(result.kept) == ["a", "big", "b"]
+    assert _names(result.truncated) == ["big", "b"]
+    assert [entry.read_limit for entry in result.kept] == [None, 50, 5]
+    assert all(entry.read_tail == (policy == "tail") for entry in result.truncated)
+    assert _names(entry for entry, _ in result.dropped) == ["c"]
+
+
+def test_token_budget_uses_byte_estimate(entries):
+    tokens = int(30 // core.BYTES_PER_TOKEN_ESTIMATE)
+    result = apply_budgets(entries, max_tokens=tokens)
+    budget = int(tokens * core.BYTES_PER_TOKEN_ESTIMATE)
+
+    kept_bytes = sum(entry.abs_path.stat().st_size for entry in result.kept)
+    assert kept_bytes <= budget
+    assert _names(result.kept) == ["a", "b"]
+
+
+def test_truncated_entries_are_read_partially(entries):
+    from copybuffer.main import read_entries
+
+    apply_budgets(entries[:2], max_file_size=4, policy="tail")
+    records = list(read_entries(entries[:2]))
+
+    assert [record.content for record in records] == ["xxxx", "xxxx"]
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Count one token per word and record which texts were tokenized."""
+    main_module = sys.modules["copybuffer.main"]
+    seen = []
+
+    def fake_batch(texts, num_threads=None):
+        texts = list(texts)
+        seen.extend(texts)
+        return [len(text.split()) for text in texts]
+
+    monkeypatch.setattr(main_module, "count_tokens_batch", fake_batch)
+    return seen
+
+
+def _tree(root, files):
+    entries = []
+    for index, (name, words) in enumerate(files):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(" ".join(f"w{i:03d}" for i in range(words)))
+        os.utime(path, ns=(index * 10**9, index * 10**9))
+        entries.append(FileEntry(path, name))
+    return entries
+
+
+def test_pack_prefers_explicit_then_shallow(tmp_path, counted):
+    entries = _tree(
+        tmp_path, [("a/b/deep.txt", 10), ("a/mid.txt", 10), ("top.txt", 10), ("x/pick.txt", 10)]
+    )
+    entries[0].explicit = True
+
+    result = pack_token_budget(entries, 25, jobs=1)
+
+    assert _names(record.entry for record in result.records) == ["a/b/deep.txt", "top.txt"]
+    assert result.tokens == 20
+    assert all(record.token_count == 10 for record in result.records)
+    assert _names(result.dropped) == ["a/mid.txt", "x/pick.txt"]
+
+
+def test_pack_recent_order(tmp_path, counted):
+    entries = _tree(tmp_path, [("old.txt", 10), ("mid.txt", 10), ("new.txt", 10)])
+
+    result = pack_token_budget(entries, 20, order="recent", jobs=1)
+
+    assert _names(record.entry for record in result.records) == ["mid.txt", "new.txt"]
+
+
+def test_pack_only_tokenizes_files_near_the_budget(tmp_path, counted):
+    entries = _tree(tmp_path, [(f"f{index:02d}.txt", 50) for index in range(40)])
+
+    result = pack_token_budget(entries, 120, jobs=1)
+
+    assert len(result.records) == 2
+    assert result.tokens == 100
+    # 50 words of "w000 " are 250 bytes, estimated at ~62 tokens each.
+    assert result.counted == len(counted) < 10
+
+
+def test_pack_recalibrates_a_pessimistic_estimate(tmp_path, counted):
+    # Each 109-byte file is 10 tokens but estimated at 28, so the first round
+    # only reads one file; the recalibrated estimate lets the rest fill up.
+    entries = []
+    for index in range(6):
+        path = tmp_path / f"f{index}.txt"
+        path.write_text(" ".join(["longwordxx"] * 10))
+        entries.append(FileEntry(path, path.name))
+
+    result = pack_token_budget(entries, 40, jobs=1)
+
+    assert result.tokens == 40
+    assert len(result.records) == 4
+
+
+def test_pack_reuses_cached_counts(tmp_path, counted):
+    entries = _tree(tmp_path, [("a.txt", 10), ("b.txt", 10)])
+    with StatsCache() as cache:
+        pack_token_budget(entries, 100, cache=cache, jobs=1)
+        assert len(counted) == 2
+        result = pack_token_budget(entries, 100, cache=cache, jobs=1)
+
+    assert len(counted) == 2
+    assert result.counted == 0
+    assert [record.token_count for record in result.records] == [10, 10]
+    assert [record.content for record in result.records] == [
+        entry.abs_path.read_text() for entry in entries
+    ]
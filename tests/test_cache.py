@@ -0,0 +1,120 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import cache as cache_module
+from copybuffer.cache import RunSnapshot, StatsCache, default_cache_dir, file_fingerprint
+from copybuffer.main import FileEntry, filter_since_last
+
+
+def test_default_cache_dir_honors_xdg(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == tmp_path / "copybuffer"
+
+
+def test_stats_cache_round_trip_and_fingerprint(tmp_path):
+    target = tmp_path / "a.txt"
+    target.write_text("hello world")
+    fingerprint = file_fingerprint(target.stat())
+    stats = {"line_count": 1, "word_count": 2}
+
+    with StatsCache(tmp_path / "cache.sqlite3") as cache:
+        assert cache.get(target, fingerprint, "cl100k_base") is None
+        cache.put(target, fingerprint, "cl100k_base", stats, 2)
+
+    with StatsCache(tmp_path / "cache.sqlite3") as cache:
+        hit = cache.get(target, fingerprint, "cl100k_base")
+        assert hit == {"text_stats": stats, "token_count": 2}
+        assert cache.get(target, fingerprint, "o200k_base") is None
+        changed = (fingerprint[0] + 1, fingerprint[1], fingerprint[2])
+        assert cache.get(target, changed, "cl100k_base") is None
+
+
+def test_stats_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(cache_module.time, "time", lambda: next(clock))
+    db = tmp_path / "cache.sqlite3"
+    with StatsCache(db, max_entries=2) as cache:
+        for name in ("a", "b", "c"):
+            cache.put(name, (1, 1, 1), "cl100k_base", {}, 1)
+        # Touch "a" so "b" becomes the least recently used entry.
+        assert cache.get("a", (1, 1, 1), "cl100k_base") is not None
+
+    with StatsCache(db) as cache:
+        assert cache.get("a", (1, 1, 1), "cl100k_base") is not None
+        assert cache.get("b", (1, 1, 1), "cl100k_base") is None
+        assert cache.get("c", (1, 1, 1), "cl100k_base") is not None
+
+
+def test_stats_cache_reads_while_another_run_holds_the_lock(tmp_path):
+    db = tmp_path / "cache.sqlite3"
+    with StatsCache(db) as cache:
+        for name in ("a", "b", "c"):
+            cache.put(name, (1, 1, 1), "cl100k_base", {}, 1)
+
+    reader = StatsCache(db)
+    # Looking rows up must not leave a write transaction open.
+    assert reader.get("a", (1, 1, 1), "cl100k_base") is not None
+    reader.put("d", (1, 1, 1), "cl100k_base", {}, 1)
+    other = sqlite3.connect(str(db), timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    other.rollback()
+
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert all(
+            reader.get(name, (1, 1, 1), "cl100k_base") is not None for name in ("a", "b", "c")
+        )
+    finally:
+        other.rollback()
+        other.close()
+    reader.close()
+
+    with StatsCache(db) as cache:
+        assert cache.get("d", (1, 1, 1), "cl100k_base") is not None
+
+
+def test_stats_cache_disables_itself_when_unwritable(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = StatsCache(blocker / "cache.sqlite3")
+    cache.put("a", (1, 1, 1), "cl100k_base", {}, 1)
+    assert cache.get("a", (1, 1, 1), "cl100k_base") is None
+    cache.close()
+
+
+def test_since_last_snapshot(tmp_path):
+    files = {name: tmp_path / name for name in ("a.txt", "b.txt")}
+    for name, path in files.items():
+        path.write_text(name)
+    entries = [FileEntry(path, name) for name, path in files.items()]
+
+    snapshot = RunSnapshot("key", tmp_path / "snapshots")
+    kept, fingerprints = filter_since_last(entries, snapshot)
+    assert kept == entries
+    snapshot.save(fingerprints)
+
+    snapshot = RunSnapshot("key", tmp_path / "snapshots")
+    assert filter_since_last(entries, snapshot)[0] == []
+
+    files["b.txt"].write_text("b changed")
+    (tmp_path / "c.txt").write_text("c")
+    entries.append(FileEntry(tmp_path / "c.txt", "c.txt"))
+    kept, _ = filter_since_last(entries, snapshot)
+    assert [entry.display_path for entry in kept] == ["b.txt", "c.txt"]
+
+    other = RunSnapshot("other key", tmp_path / "snapshots")
+    assert filter_since_last(entries, other)[0] == entries
+
+
+def test_snapshot_is_best_effort(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    snapshot = RunSnapshot("key", blocker)
+    snapshot.save([(tmp_path / "a.txt", (1, 2, 3))])
+    assert snapshot.previous() == {}
+
+    corrupt = RunSnapshot("key", tmp_path)
+    corrupt.path.write_text("{not json")
+    assert corrupt.previous() == {}
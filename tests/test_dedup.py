@@ -0,0 +1,140 @@
+"""Tests for content-hash deduplication (--dedup).
+
+Expected results:
+- Only files sharing a size are hashed; hard links are matched without hashing.
+- Duplicates point at the first entry with the same content; empty files and
+  truncated reads are left alone.
+- Output writers emit a reference (header, cp, or shared tar member) instead
+  of the contents again.
+- The summary reports the sizes seen while matching, so a duplicate removed
+  afterwards does not break the run.
+"""
+
+import io
+import os
+from pathlib import Path
+import sys
+
+import pyperclip
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import sinks
+from copybuffer.core import DuplicateOf
+from copybuffer.main import FileEntry, find_duplicates
+
+
+def _entries(root, files):
+    entries = []
+    for name, contents in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(contents, Path):
+            os.link(root / contents, path)
+        else:
+            path.write_text(contents)
+        entries.append(FileEntry(path, name))
+    return entries
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_find_duplicates(tmp_path, monkeypatch, jobs):
+    main_module = sys.modules["copybuffer.main"]
+    hashed = []
+    real_hash = main_module._hash_entry
+
+    def recording_hash(entry):
+        hashed.append(entry.display_path)
+        return real_hash(entry)
+
+    monkeypatch.setattr(main_module, "_hash_entry", recording_hash)
+    entries = _entries(
+        tmp_path,
+        {
+            "a.txt": "same text",
+            "b.txt": "other",
+            "c.txt": "same texx",
+            "link.txt": Path("a.txt"),
+            "vendor/a.txt": "same text",
+            "empty1": "",
+            "empty2": "",
+            "truncated.txt": "same text",
+        },
+    )
+    entries[-1].read_limit = 4
+
+    unique, duplicates = find_duplicates(entries, jobs)
+
+    assert [entry.display_path for entry in unique] == [
+        "a.txt", "b.txt", "c.txt", "empty1", "empty2", "truncated.txt"
+    ]
+    assert [(entry.display_path, entry.duplicate_of.display_path) for entry in duplicates] == [
+        ("link.txt", "a.txt"),
+        ("vendor/a.txt", "a.txt"),
+    ]
+    assert sorted(hashed) == ["a.txt", "c.txt", "vendor/a.txt"]
+
+
+def test_hard_link_to_a_duplicate_points_at_the_first_copy(tmp_path):
+    entries = _entries(
+        tmp_path, {"a.txt": "same", "b.txt": "same", "c.txt": Path("b.txt")}
+    )
+
+    _, duplicates = find_duplicates(entries, 1)
+
+    assert {entry.duplicate_of.display_path for entry in duplicates} == {"a.txt"}
+
+
+def test_cli_summary_survives_a_removed_duplicate(tmp_path, monkeypatch, capfd):
+    main_module = sys.modules["copybuffer.main"]
+    _entries(tmp_path, {"a.txt": "same", "v/a.txt": "same"})
+    real_find = main_module.find_duplicates
+
+    def find_then_remove(entries, jobs=None):
+        unique, duplicates = real_find(entries, jobs)
+        for entry in duplicates:
+            entry.abs_path.unlink()
+        return unique, duplicates
+
+    monkeypatch.setattr(main_module, "find_duplicates", find_then_remove)
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("clipboard used"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["cb", "-r", ".", "-i", "--dedup", "--stdout"])
+    main_module.main()
+
+    out, err = capfd.readouterr()
+    assert out == "=== File: a.txt ===\nsame\n=== File: v/a.txt (same content as a.txt) ===\n"
+    assert "Deduplicated 1 file (4 bytes not copied again)" in err
+
+
+ITEMS = [("a.txt", "same"), ("b.txt", "other"), ("v/a.txt", DuplicateOf("a.txt"))]
+
+
+@pytest.mark.parametrize(
+    "discord_attachment, reference",
+    [
+        (False, "=== File: v/a.txt (same content as a.txt) ===\n"),
+        (True, "[Attached file: v/a.txt\nSame content as: a.txt]\n"),
+    ],
+)
+def test_file_contents_reference_duplicates(discord_attachment, reference):
+    stream = io.BytesIO()
+    sinks.write_file_contents(sinks.StreamSink(stream), ITEMS, True, discord_attachment)
+    text = stream.getvalue().decode()
+    assert text.endswith(reference)
+    assert text.count("same\n") == 1
+
+
+def test_scripts_reference_duplicates():
+    stream = io.BytesIO()
+    assert sinks.write_heredoc_script(sinks.StreamSink(stream), ITEMS) == 3
+    assert stream.getvalue().decode().endswith("cp -- 'a.txt' 'v/a.txt'\n")
+
+    with pytest.raises(ValueError):
+        sinks.write_heredoc_script(sinks.StreamSink(io.BytesIO()), ITEMS, append=True)
+
+    stream = io.BytesIO()
+    assert sinks.write_compressed_script(sinks.StreamSink(stream), ITEMS, append=True) == 3
+    script = stream.getvalue().decode()
+    assert "cat >> 'a.txt' < \"$cb_payload/0\"" in script
+    assert "cat >> 'v/a.txt' < \"$cb_payload/0\"" in script
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 import sys
 
@@ -100,3 +101,44 @@ def test_discover_files_skips_git_directory(tmp_path, monkeypatch):
     assert directory_errors == []
     assert _as_relative_paths(text_entries) == ["repo/keep.txt"]
     assert image_entries == []
+
+
+def test_ignored_directories_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".gitignore").write_text("node_modules/\n")
+    (tmp_path / "app" / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "app" / "node_modules" / "pkg" / "index.js").write_text("x")
+    (tmp_path / "app" / "main.js").write_text("main")
+
+    scanned = []
+    real_scandir = os.scandir
+
+    def recording_scandir(path):
+        scanned.append(os.path.relpath(path, tmp_path))
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", recording_scandir)
+    text_entries, _, _, _ = discover_files(
+        ["app"], include_directory=False, recursive=True, allow_images=False
+    )
+
+    assert _as_relative_paths(text_entries) == ["app/main.js"]
+    assert scanned == ["app"]
+
+
+def test_walk_uses_lexical_paths_and_skips_symlinked_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".gitignore").write_text("secret.txt\n")
+    (tmp_path / "outside").mkdir()
+    (tmp_path / "outside" / "secret.txt").write_text("hidden")
+    (tmp_path / "outside" / "other.txt").write_text("other")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "linked_dir").symlink_to(tmp_path / "outside", target_is_directory=True)
+    (tmp_path / "src" / "linked.txt").symlink_to(tmp_path / "outside" / "other.txt")
+    (tmp_path / "src" / "secret.txt").write_text("ignored by name")
+
+    text_entries, _, _, _ = discover_files(
+        ["./src"], include_directory=False, recursive=True, allow_images=False
+    )
+
+    assert _as_relative_paths(text_entries) == ["src/linked.txt"]
@@ -0,0 +1,149 @@
+import io
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        (b"\xff\xfeh\x00i\x00", ("utf-16-le", True)),
+        (b"\xfe\xff\x00h\x00i", ("utf-16-be", True)),
+        (b"\xef\xbb\xbfhello", ("utf-8", True)),
+        (b"plain ascii", ("utf-8", False)),
+        ("café ☃".encode("utf-8"), ("utf-8", False)),
+    ],
+)
+def test_detect_encoding_boms_and_fast_path(data, expected):
+    assert core.detect_encoding(data) == expected
+
+
+def test_detect_encoding_validates_beyond_sample(monkeypatch):
+    monkeypatch.setattr(core, "ENCODING_SAMPLE_SIZE", 16)
+    monkeypatch.setattr(core, "_chardet_guess", lambda sample: None)
+
+    # Multi-byte character straddling the end of the sample is still UTF-8.
+    straddling = b"a" * 15 + "é".encode("utf-8") + b"tail"
+    assert core.detect_encoding(straddling) == ("utf-8", False)
+
+    # Invalid UTF-8 after an ASCII sample must not be reported as UTF-8.
+    latin = b"a" * 32 + b"caf\xe9!"
+    assert core.detect_encoding(latin) == ("latin-1", False)
+
+
+def test_detect_encoding_rechecks_sample_guess(monkeypatch):
+    monkeypatch.setattr(core, "ENCODING_SAMPLE_SIZE", 8)
+    monkeypatch.setattr(core, "_chardet_guess", lambda sample: "ascii")
+
+    data = b"\x00" * 8 + b"\xe9"
+    assert core.detect_encoding(data) == ("latin-1", False)
+
+
+@pytest.mark.parametrize("threshold", [0, 1 << 30])
+@pytest.mark.parametrize(
+    "raw, expected_text, expected_encoding",
+    [
+        (b"\xef\xbb\xbfhello\nworld", "hello\nworld", "utf-8"),
+        ("\ufeffhi there".encode("utf-16-le"), "hi there", "utf-16-le"),
+        ("\ufeffodd".encode("utf-16-be") + b"\x00", "odd", "utf-16-be"),
+        ("naïve".encode("utf-8"), "naïve", "utf-8"),
+    ],
+)
+def test_read_with_encoding_plain_and_mmap(
+    tmp_path, threshold, raw, expected_text, expected_encoding
+):
+    path = tmp_path / "sample.txt"
+    path.write_bytes(raw)
+
+    content, detected = core.read_with_encoding(path, mmap_threshold=threshold)
+
+    assert content == expected_text
+    assert detected == expected_encoding
+
+
+def test_read_with_encoding_empty_file_with_mmap_threshold(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert core.read_with_encoding(path, mmap_threshold=0) == ("", "utf-8")
+
+
+@pytest.mark.parametrize("tail", [False, True])
+@pytest.mark.parametrize("limit", range(1, 14))
+def test_read_with_encoding_truncates_on_character_boundaries(tmp_path, tail, limit):
+    text = "aé☃€b😀c"
+    path = tmp_path / "sample.txt"
+    path.write_bytes(text.encode("utf-8"))
+
+    content, detected = core.read_with_encoding(path, max_bytes=limit, tail=tail)
+
+    assert detected == "utf-8"
+    assert len(content.encode("utf-8")) <= limit
+    assert text.endswith(content) if tail else text.startswith(content)
+
+
+def test_read_with_encoding_tail_keeps_utf16_bom(tmp_path):
+    path = tmp_path / "sample.txt"
+    path.write_bytes("\ufeffheader\nlast line\n".encode("utf-16-le"))
+
+    content, detected = core.read_with_encoding(path, max_bytes=12, tail=True)
+
+    assert detected == "utf-16-le"
+    assert content == "line\n"
+
+
+def _reader(data, **kwargs):
+    return core.StdinReader(io.BufferedReader(io.BytesIO(data)), **kwargs)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+@pytest.mark.parametrize(
+    "raw, expected_encoding",
+    [
+        ("naïve ☃ 😀 text\n".encode("utf-8"), "utf-8"),
+        ("\ufeffnaïve ☃ 😀 text\n".encode("utf-8"), "utf-8"),
+        ("\ufeffnaïve ☃ 😀 text\n".encode("utf-16-le"), "utf-16-le"),
+        ("\ufeffnaïve ☃ 😀 text\n".encode("utf-16-be"), "utf-16-be"),
+    ],
+)
+def test_stdin_reader_decodes_incrementally(raw, expected_encoding, chunk_size):
+    reader = _reader(raw, chunk_size=chunk_size)
+
+    chunks = list(reader)
+
+    assert "".join(chunks) == "naïve ☃ 😀 text\n"
+    assert reader.encoding == expected_encoding
+    assert reader.bytes_read == len(raw)
+    assert not reader.truncated
+    if chunk_size < len(raw):
+        assert len(chunks) > 1
+
+
+@pytest.mark.parametrize("max_bytes", range(0, 12))
+def test_stdin_reader_cap_drops_a_cut_character(max_bytes):
+    raw = "a☃b😀".encode("utf-8")
+    reader = _reader(raw, max_bytes=max_bytes, chunk_size=2)
+
+    text = "".join(reader)
+
+    assert "a☃b😀".startswith(text)
+    assert len(text.encode("utf-8")) <= max_bytes
+    assert reader.truncated == (max_bytes < len(raw))
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        [],
+        ["  ", "\n"],
+        ["  lead", "ing", " mid ", " ", "dle", "  \n", " "],
+        ["\n", " a", "b\t", "\t", "c", "\n\n"],
+    ],
+)
+def test_strip_chunks_matches_strip(chunks):
+    pieces = list(core.strip_chunks(chunks))
+    assert "".join(pieces) == "".join(chunks).strip()
+    assert all(pieces)
@@ -0,0 +1,150 @@
+"""Tests for git-index-backed discovery (--git).
+
+Expected results:
+- Directories list tracked files only, including tracked files that match
+  .gitignore, and skip files deleted from the working tree.
+- include_untracked adds untracked files that are not ignored.
+- Display paths, sorting and -d (non-recursive) behave like the walker.
+- Outside a repository discovery falls back to walking the directory.
+- filter_changed keeps staged, unstaged and untracked changes relative to a ref.
+- cb --changed takes no value, so a path after it is a path; --changed-ref
+  picks the ref.
+"""
+
+from pathlib import Path
+import subprocess
+import sys
+
+import pyperclip
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import gitfiles
+from copybuffer.main import discover_files, filter_changed
+
+
+def _git(root, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=cb", "-c", "user.email=cb@example.com", *args],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    try:
+        subprocess.run(["git", "--version"], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not installed")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    root = tmp_path / "repo"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "main.py").write_text("main")
+    (root / "src" / "pkg" / "mod.py").write_text("mod")
+    (root / "src" / "gone.py").write_text("gone")
+    (root / "logo.png").write_bytes(b"png")
+    (root / "forced.log").write_text("tracked although ignored")
+    _git(root, "init", "-q")
+    _git(root, "add", ".")
+    _git(root, "commit", "-qm", "initial")
+    (root / ".gitignore").write_text("*.log\n")
+    (root / "src" / "gone.py").unlink()
+    (root / "src" / "new.py").write_text("new")
+    (root / "src" / "debug.log").write_text("ignored")
+    monkeypatch.chdir(root)
+    return root
+
+
+def _paths(entries):
+    return [entry.display_path for entry in entries]
+
+
+def test_git_lists_tracked_files(repo):
+    text, images, missing, _ = discover_files(
+        ["."], include_directory=False, recursive=True, allow_images=True, use_git=True
+    )
+    assert missing == []
+    assert _paths(text) == ["forced.log", "src/main.py", "src/pkg/mod.py"]
+    assert _paths(images) == ["logo.png"]
+
+
+def test_git_untracked_and_display_paths(repo):
+    text, _, _, _ = discover_files(
+        ["./src"],
+        include_directory=False,
+        recursive=True,
+        allow_images=False,
+        use_git=True,
+        include_untracked=True,
+    )
+    assert _paths(text) == ["src/main.py", "src/new.py", "src/pkg/mod.py"]
+    assert text[0].abs_path == repo / "src" / "main.py"
+
+
+def test_git_non_recursive_and_dedup(repo):
+    text, _, _, _ = discover_files(
+        ["src", "src/main.py"],
+        include_directory=True,
+        recursive=False,
+        allow_images=False,
+        use_git=True,
+    )
+    assert _paths(text) == ["src/main.py"]
+
+
+def test_git_falls_back_to_walk_outside_repository(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "plain").mkdir()
+    (tmp_path / "plain" / "a.txt").write_text("a")
+    assert gitfiles.list_git_files(tmp_path / "plain") is None
+
+    text, _, _, _ = discover_files(
+        ["plain"], include_directory=False, recursive=True, allow_images=False, use_git=True
+    )
+    assert _paths(text) == ["plain/a.txt"]
+
+
+def test_filter_changed_against_refs(repo):
+    (repo / "src" / "main.py").write_text("edited")
+    _git(repo, "add", "src/main.py")
+    (repo / "src" / "pkg" / "mod.py").write_text("unstaged edit")
+    text, _, _, _ = discover_files(
+        ["."], include_directory=False, recursive=True, allow_images=False
+    )
+
+    changed = filter_changed(text, "HEAD")
+    assert _paths(changed) == [".gitignore", "src/main.py", "src/new.py", "src/pkg/mod.py"]
+
+    _git(repo, "commit", "-qam", "second")
+    assert _paths(filter_changed(text, "HEAD")) == [".gitignore", "src/new.py"]
+    assert _paths(filter_changed(text, "HEAD~1")) == [
+        ".gitignore",
+        "src/main.py",
+        "src/new.py",
+        "src/pkg/mod.py",
+    ]
+
+    with pytest.raises(ValueError):
+        filter_changed(text, "no-such-ref")
+
+
+def test_cli_changed_flag_is_followed_by_paths(repo, monkeypatch, capfd):
+    main_module = sys.modules["copybuffer.main"]
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("clipboard used"))
+    (repo / "src" / "main.py").write_text("edited")
+    (repo / "logo.png").write_bytes(b"changed png")
+
+    def run(*argv):
+        monkeypatch.setattr(sys, "argv", ["cb", "-i", "--stdout", "--no-cache", *argv])
+        main_module.main()
+        return capfd.readouterr().out
+
+    assert run("-r", "--changed", "src/") == (
+        "=== File: src/main.py ===\nedited\n=== File: src/new.py ===\nnew\n"
+    )
+    _git(repo, "commit", "-qam", "second")
+    assert run("-r", "--changed", "src/") == "=== File: src/new.py ===\nnew\n"
+    assert "src/main.py" in run("-r", "--changed-ref", "HEAD~1", "src/")
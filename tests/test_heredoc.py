@@ -31,6 +31,23 @@ def test_choose_unique_heredoc_delimiter_unique(monkeypatch):
     assert delim not in contents
 
 
+@pytest.mark.parametrize("seed", range(20))
+def test_choose_unique_heredoc_delimiter_avoids_every_occurrence(monkeypatch, seed):
+    import random
+
+    rng = random.Random(seed)
+    pool = ["ab", "abcd", "ab12", "ff", "0a0a"]
+    monkeypatch.setattr(secrets, "token_hex", lambda n: rng.choice(pool) * (n // 2))
+    contents = "".join(
+        rng.choice(["EOF_CB_", "AB", "CD", "12", "FF", "0A", "x", "\n"]) for _ in range(200)
+    )
+
+    delim = _choose_unique_heredoc_delimiter(contents)
+
+    assert delim.startswith("EOF_CB_")
+    assert delim not in contents
+
+
 @pytest.mark.parametrize("append", [False, True])
 def test_generate_heredoc_script(tmp_path, append):
     file_paths = [
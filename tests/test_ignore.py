@@ -0,0 +1,167 @@
+"""Tests for layered gitignore matching.
+
+Expected results:
+- Directory walks honour nested .gitignore files, negations, info/exclude and
+  the global excludes file exactly as `git ls-files --others --exclude-standard`.
+- Each directory's .gitignore is read once per matcher.
+- Explicit files inside ignored directories stay ignored.
+- git is asked for the global excludes file once per discovery, however
+  many repositories and directories the arguments span.
+"""
+
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import ignore
+from copybuffer.ignore import IgnoreMatcher
+from copybuffer.main import discover_files
+
+
+TREE = {
+    ".gitignore": "*.log\nbuild/\n/only_root.txt\n!keep.log\ndocs/*.md\n!docs/README.md\n",
+    "keep.log": "",
+    "drop.log": "",
+    "only_root.txt": "",
+    "build/out.txt": "",
+    "docs/guide.md": "",
+    "docs/README.md": "",
+    "docs/api/deep.md": "",
+    "src/only_root.txt": "",
+    "src/main.py": "",
+    "src/gen.tmp": "",
+    "src/.gitignore": "*.py\n!main.py\nlocal/\n",
+    "src/helper.py": "",
+    "src/local/x.txt": "",
+    "src/pkg/.gitignore": "!*.log\n",
+    "src/pkg/trace.log": "",
+    "src/pkg/mod.py": "",
+    "vendor/lib.c": "",
+    "secret.key": "",
+    "notes.bak": "",
+}
+
+
+def _make_tree(root):
+    for relative, contents in TREE.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    try:
+        subprocess.run(["git", "--version"], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not installed")
+    root = tmp_path / "repo"
+    root.mkdir()
+    home = tmp_path / "home"
+    (home / ".config" / "git").mkdir(parents=True)
+    (home / ".config" / "git" / "ignore").write_text("*.bak\n")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    subprocess.run(["git", "init", "-q", str(root)], check=True)
+    _make_tree(root)
+    (root / ".git" / "info").mkdir(exist_ok=True)
+    (root / ".git" / "info" / "exclude").write_text("vendor/\n*.key\n")
+    return root
+
+
+def _git_untracked(root):
+    output = subprocess.run(
+        ["git", "ls-files", "-z", "--others", "--exclude-standard"],
+        cwd=root,
+        capture_output=True,
+        check=True,
+    ).stdout
+    return sorted(path.decode() for path in output.split(b"\0") if path)
+
+
+def test_walk_matches_git(repo, monkeypatch):
+    monkeypatch.chdir(repo)
+    text_entries, image_entries, _, _ = discover_files(
+        ["."], include_directory=False, recursive=True, allow_images=True
+    )
+    found = sorted(entry.display_path for entry in text_entries + image_entries)
+    assert found == _git_untracked(repo)
+    assert "src/pkg/trace.log" in found
+    assert "notes.bak" not in found
+
+
+def test_walk_from_subdirectory_uses_repository_rules(repo, monkeypatch):
+    monkeypatch.chdir(repo / "src")
+    text_entries, _, _, _ = discover_files(
+        ["."], include_directory=False, recursive=True, allow_images=False
+    )
+    expected = [path[len("src/"):] for path in _git_untracked(repo) if path.startswith("src/")]
+    assert sorted(entry.display_path for entry in text_entries) == expected
+
+
+def test_explicit_files_in_ignored_directories(repo, monkeypatch):
+    monkeypatch.chdir(repo)
+    (repo / "build" / "keep.log").write_text("")
+    text_entries, _, missing, _ = discover_files(
+        ["build/out.txt", "build/keep.log", "src/main.py", "drop.log"],
+        include_directory=False,
+        recursive=False,
+        allow_images=False,
+    )
+    assert missing == []
+    assert [entry.display_path for entry in text_entries] == ["src/main.py"]
+
+
+def test_gitignore_files_are_compiled_once(tmp_path, monkeypatch):
+    _make_tree(tmp_path)
+    reads = []
+    real_read = ignore._read_patterns
+
+    def counting_read(path):
+        reads.append(path)
+        return real_read(path)
+
+    monkeypatch.setattr(ignore, "_read_patterns", counting_read)
+    matcher = IgnoreMatcher(tmp_path)
+    for _ in range(3):
+        assert matcher.match("src/helper.py")
+        assert not matcher.match("src/main.py")
+        assert not matcher.match("src/pkg/trace.log")
+        assert matcher.match("src/pkg/debug.log") is False
+        assert matcher.match("drop.log")
+    assert len(reads) == len(set(reads))
+
+
+def test_global_excludes_file_is_resolved_once(repo, tmp_path, monkeypatch):
+    other = tmp_path / "other"
+    subprocess.run(["git", "init", "-q", str(other)], check=True)
+    outside = tmp_path / "plain"
+    paths = []
+    for index in range(10):
+        for parent in (other / f"d{index}", outside / f"d{index}"):
+            parent.mkdir(parents=True)
+            (parent / "f.txt").write_text("x")
+            (parent / "f.bak").write_text("x")
+            paths += [str(parent / "f.txt"), str(parent / "f.bak")]
+    calls = []
+    real_run = ignore.subprocess.run
+
+    def counting_run(*args, **kwargs):
+        calls.append(args[0])
+        return real_run(*args, **kwargs)
+
+    monkeypatch.setattr(ignore.subprocess, "run", counting_run)
+    monkeypatch.chdir(repo)
+    text_entries, _, _, _ = discover_files(
+        paths, include_directory=False, recursive=False, allow_images=False
+    )
+
+    assert len(calls) == 1
+    found = [entry.abs_path.name for entry in text_entries]
+    # *.bak comes from the global excludes file, so only applies in repositories.
+    assert found.count("f.txt") == 20
+    assert found.count("f.bak") == 10
@@ -1,7 +1,10 @@
+import os
 from pathlib import Path
 from PIL import Image
 import sys
 
+import pytest
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from copybuffer import core
 
@@ -50,3 +53,128 @@ def test_copy_image_xclip(monkeypatch, tmp_path):
     assert captured["cmd"][:4] == ["xclip", "-selection", "clipboard", "-t"]
     assert captured["cmd"][4] == "image/png"
     assert captured["input"].startswith(b"\x89PNG")
+
+
+def _fake_wl_copy(monkeypatch, tmp_path):
+    """Install a real ``wl-copy`` that saves its stdin, and return that path."""
+    received = tmp_path / "clipboard.bin"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    tool = bin_dir / "wl-copy"
+    tool.write_text(f"#!/bin/sh\ncat > '{received}'\n")
+    tool.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(
+        core, "get_clipboard_backend", lambda: core.ClipboardBackend("wl-copy", str(tool))
+    )
+    return received
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="needs a POSIX shell")
+@pytest.mark.parametrize("size", [(1, 1), (64, 32), (400, 300)])
+def test_png_is_passed_through_without_decoding(monkeypatch, tmp_path, size):
+    path = tmp_path / "shot.png"
+    Image.effect_noise(size, 64).convert("RGB").save(path, format="PNG")
+    received = _fake_wl_copy(monkeypatch, tmp_path)
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("PNG was decoded")
+
+    monkeypatch.setattr(Image, "open", no_decode)
+
+    assert core.copy_image_to_clipboard(str(path))
+    assert received.read_bytes() == path.read_bytes()
+
+
+def test_missing_image(capsys, tmp_path):
+    assert not core.copy_image_to_clipboard(str(tmp_path / "missing.png"))
+    assert "not found" in capsys.readouterr().out
+
+
+def _capture_wl_copy(monkeypatch):
+    captured = {}
+
+    def fake_run(cmd, input=None, stdin=None, check=None):
+        captured["cmd"] = cmd
+        captured["input"] = input if stdin is None else stdin.read()
+
+    monkeypatch.setattr(core, "is_wayland", lambda: True)
+    monkeypatch.setattr(core.shutil, "which", lambda cmd: "/usr/bin/" + cmd)
+    monkeypatch.setattr(core.subprocess, "run", fake_run)
+    return captured
+
+
+def _copied_image(captured):
+    import io
+
+    return Image.open(io.BytesIO(captured["input"]))
+
+
+def test_image_max_dim_downscales_jpeg_with_draft(monkeypatch, tmp_path):
+    path = tmp_path / "photo.jpg"
+    Image.new("RGB", (1600, 1200), color="green").save(path, format="JPEG")
+    captured = _capture_wl_copy(monkeypatch)
+    from PIL import JpegImagePlugin
+
+    drafts = []
+    real_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def recording_draft(self, mode, size):
+        drafts.append(size)
+        return real_draft(self, mode, size)
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", recording_draft)
+
+    assert core.copy_image_to_clipboard(str(path), max_dim=400)
+    assert drafts[0] == (400, 400)
+    assert _copied_image(captured).size == (400, 300)
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="needs a POSIX shell")
+def test_png_within_limits_keeps_fast_path(monkeypatch, tmp_path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (300, 100), color="blue").save(path, format="PNG")
+    received = _fake_wl_copy(monkeypatch, tmp_path)
+
+    assert core.copy_image_to_clipboard(str(path), max_dim=300, max_bytes=1 << 20)
+    assert received.read_bytes() == path.read_bytes()
+
+    assert core.copy_image_to_clipboard(str(path), max_dim=150)
+    assert Image.open(received).size == (150, 50)
+
+
+def test_image_max_bytes_shrinks_until_it_fits(monkeypatch, tmp_path):
+    path = tmp_path / "noise.png"
+    Image.effect_noise((512, 512), 64).convert("RGB").save(path, format="PNG")
+    captured = _capture_wl_copy(monkeypatch)
+    limit = path.stat().st_size // 10
+
+    assert core.copy_image_to_clipboard(str(path), max_bytes=limit)
+    assert len(captured["input"]) <= limit
+    assert max(_copied_image(captured).size) < 512
+
+    captured.clear()
+    assert not core.copy_image_to_clipboard(str(path), max_bytes=10)
+    assert captured == {}
+
+
+def test_image_max_bytes_decodes_a_png_once(monkeypatch, tmp_path):
+    path = tmp_path / "large.png"
+    Image.effect_noise((1600, 1200), 64).convert("RGB").save(path, format="PNG")
+    captured = _capture_wl_copy(monkeypatch)
+    from PIL import ImageFile
+
+    decodes = []
+    real_load = ImageFile.ImageFile.load
+
+    def counting_load(self):
+        if self.tile:
+            decodes.append(self.size)
+        return real_load(self)
+
+    monkeypatch.setattr(ImageFile.ImageFile, "load", counting_load)
+    limit = path.stat().st_size // 4
+
+    assert core.copy_image_to_clipboard(str(path), max_bytes=limit)
+    assert decodes == [(1600, 1200)]
+    assert len(captured["input"]) <= limit
@@ -0,0 +1,60 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer.main import FileEntry, read_entries
+
+
+def _entries(tmp_path, names):
+    return [FileEntry(abs_path=tmp_path / name, display_path=name) for name in names]
+
+
+def test_read_entries_preserves_order_with_threads(tmp_path):
+    names = [f"file{i:03}.txt" for i in range(50)]
+    for name in names:
+        (tmp_path / name).write_text(f"contents of {name}")
+
+    results = list(read_entries(_entries(tmp_path, names), jobs=4))
+
+    assert [result.entry.display_path for result in results] == names
+    assert [result.content for result in results] == [
+        f"contents of {name}" for name in names
+    ]
+    assert all(result.error is None for result in results)
+
+
+def test_read_entries_captures_errors_in_place(tmp_path):
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "c.txt").write_text("gamma")
+    entries = _entries(tmp_path, ["a.txt", "missing.txt", "c.txt"])
+
+    for jobs in (1, 3):
+        results = list(read_entries(entries, jobs=jobs))
+        assert [result.content for result in results] == ["alpha", None, "gamma"]
+        assert isinstance(results[1].error, FileNotFoundError)
+
+
+def test_token_stats_reuse_record_content(tmp_path, monkeypatch, capsys):
+    from copybuffer import core
+
+    # copybuffer.main is shadowed by the main() function re-exported from the package
+    main_module = sys.modules["copybuffer.main"]
+    (tmp_path / "a.txt").write_text("one two three\n")
+    records = list(read_entries(_entries(tmp_path, ["a.txt"]), jobs=1))
+
+    def fail_read(*args, **kwargs):
+        raise AssertionError("file was read a second time")
+
+    class FakeEncoding:
+        def encode_ordinary(self, text):
+            return text.split()
+
+    monkeypatch.setattr(core, "read_with_encoding", fail_read)
+    monkeypatch.setattr(main_module, "read_with_encoding", fail_read)
+    monkeypatch.setattr(core, "get_tokenizer", lambda name=None: FakeEncoding())
+
+    main_module._print_token_stats(records)
+
+    assert records[0].token_count == 3
+    assert records[0].stats["word_count"] == 3
+    assert "Token Count: 3" in capsys.readouterr().out
@@ -0,0 +1,315 @@
+"""Tests for the streaming output sinks.
+
+Expected results:
+- Streamed file blocks and heredoc scripts match the text built by
+  copy_file_contents_to_clipboard and generate_heredoc_script.
+- Output is written as each file is produced, not after the last one.
+- The compressed paste script recreates the same files as the heredoc script,
+  in overwrite and append mode, with a smaller payload for source code.
+- The clipboard sink streams into the backend tool and falls back to pyperclip.
+- cb --stdout/--output write the text without touching the clipboard, and
+  STDIN is streamed through with its size cap applied.
+"""
+
+import io
+from pathlib import Path
+import subprocess
+import sys
+
+import pyperclip
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core, sinks
+
+
+FILES = [("a.txt", "alpha"), ("dir/b.txt", "beta\nwith lines"), ("c 'q'.txt", "")]
+
+
+@pytest.mark.parametrize("include_header", [False, True])
+@pytest.mark.parametrize("discord_attachment", [False, True])
+def test_write_file_contents_matches_clipboard_text(monkeypatch, include_header, discord_attachment):
+    monkeypatch.setattr(pyperclip, "copy", lambda text: None)
+    paths = [path for path, _ in FILES]
+    contents = [text for _, text in FILES]
+    expected = core.copy_file_contents_to_clipboard(
+        contents, include_header, discord_attachment, paths
+    )
+
+    stream = io.BytesIO()
+    sink = sinks.StreamSink(stream)
+    assert sinks.write_file_contents(sink, FILES, include_header, discord_attachment) == 3
+    assert stream.getvalue().decode() == expected
+    assert sink.written == len(expected)
+
+
+def test_write_heredoc_script_matches_generated_script(monkeypatch):
+    monkeypatch.setattr(core, "_choose_unique_heredoc_delimiter", lambda contents: "EOF_CB_TEST")
+    paths = [path for path, _ in FILES]
+    contents = [text for _, text in FILES]
+
+    for append in (False, True):
+        stream = io.BytesIO()
+        assert sinks.write_heredoc_script(sinks.StreamSink(stream), FILES, append) == 3
+        assert stream.getvalue().decode() == core.generate_heredoc_script(paths, contents, append)
+
+    stream = io.BytesIO()
+    assert sinks.write_heredoc_script(sinks.StreamSink(stream), []) == 0
+    assert stream.getvalue() == b""
+
+
+def test_blocks_are_written_before_the_next_file_is_read():
+    stream = io.BytesIO()
+    seen = []
+
+    def items():
+        for path, text in FILES:
+            seen.append(stream.getvalue())
+            yield path, text
+
+    sinks.write_file_contents(sinks.StreamSink(stream), items())
+    assert seen == [b"", b"alpha\n", b"alpha\nbeta\nwith lines\n"]
+
+
+def _run_script(script, cwd):
+    try:
+        subprocess.run(["bash", "-c", "base64 --help && tar --help"], capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("bash, base64 or tar is not available")
+    subprocess.run(["bash"], input=script.encode(), cwd=cwd, check=True)
+
+
+@pytest.mark.parametrize("append", [False, True])
+def test_compressed_script_matches_heredoc_script(tmp_path, append):
+    files = FILES + [("../outside.txt", "up"), ("dir/$x `y`.txt", "naïve ☃\n\n")]
+    results = []
+    for name, writer in [
+        ("heredoc", sinks.write_heredoc_script),
+        ("compressed", sinks.write_compressed_script),
+    ]:
+        cwd = tmp_path / name / "work"
+        cwd.mkdir(parents=True)
+        if append:
+            (cwd / "a.txt").write_text("existing\n")
+        stream = io.BytesIO()
+        assert writer(sinks.StreamSink(stream), files, append) == len(files)
+        _run_script(stream.getvalue().decode(), cwd)
+        results.append(
+            sorted(
+                (path.relative_to(tmp_path / name).as_posix(), path.read_bytes())
+                for path in (tmp_path / name).rglob("*")
+                if path.is_file()
+            )
+        )
+
+    assert results[0] == results[1]
+    assert ("work/a.txt", b"existing\nalpha\n" if append else b"alpha\n") in results[1]
+
+    stream = io.BytesIO()
+    assert sinks.write_compressed_script(sinks.StreamSink(stream), []) == 0
+    assert stream.getvalue() == b""
+
+
+def test_corrupt_compressed_payload_leaves_files_untouched(tmp_path):
+    stream = io.BytesIO()
+    sinks.write_compressed_script(sinks.StreamSink(stream), FILES)
+    lines = stream.getvalue().decode().splitlines(keepends=True)
+    payload = lines.index(f"{sinks.PAYLOAD_DELIMITER}\n") - 1
+    # A valid base64 line with different bytes, as if mangled in transit.
+    lines[payload] = "A" * (len(lines[payload]) - 1) + "\n"
+    (tmp_path / "a.txt").write_text("keep me\n")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        _run_script("".join(lines), tmp_path)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.txt"]
+    assert (tmp_path / "a.txt").read_text() == "keep me\n"
+
+
+def test_compressed_script_is_smaller_for_source_code():
+    source = Path(core.__file__).read_text(encoding="utf-8")
+    files = [(f"pkg/module{index}.py", source) for index in range(3)]
+
+    sizes = []
+    for writer in (sinks.write_heredoc_script, sinks.write_compressed_script):
+        stream = io.BytesIO()
+        writer(sinks.StreamSink(stream), files)
+        sizes.append(len(stream.getvalue()))
+
+    assert sizes[1] * 2 < sizes[0]
+
+
+class _FakeProcess:
+    def __init__(self, returncode=0):
+        self.returncode = returncode
+        self.chunks = []
+        self.closed = False
+        self.killed = False
+        self.stdin = self
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def close(self):
+        self.closed = True
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        return self.returncode
+
+
+def test_clipboard_sink_streams_into_backend(monkeypatch):
+    processes = []
+
+    def fake_popen(cmd, **kwargs):
+        processes.append(_FakeProcess())
+        return processes[-1]
+
+    monkeypatch.setattr(core.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("pyperclip used"))
+
+    sink = sinks.ClipboardSink(core.ClipboardBackend("wl-copy", "/usr/bin/wl-copy"))
+    with sink:
+        assert processes == []
+        sink.write("héllo ")
+        sink.write("wörld")
+        assert b"".join(processes[0].chunks) == "héllo ".encode() + "wörld".encode()
+        assert not processes[0].closed
+
+    assert len(processes) == 1
+    assert processes[0].closed
+
+
+def test_clipboard_sink_falls_back_to_pyperclip(monkeypatch):
+    captured = []
+    monkeypatch.setattr(core.subprocess, "Popen", lambda cmd, **kwargs: _FakeProcess(returncode=1))
+    monkeypatch.setattr(pyperclip, "copy", captured.append)
+
+    with sinks.ClipboardSink(core.ClipboardBackend("xclip", "/usr/bin/xclip")) as sink:
+        sink.write("one ")
+        sink.write("two")
+    with sinks.ClipboardSink(core.ClipboardBackend("win32")) as sink:
+        sink.write("win")
+    with sinks.ClipboardSink(core.ClipboardBackend("win32")):
+        pass
+
+    assert captured == ["one two", "win"]
+
+
+def test_clipboard_sink_reports_missing_clipboard(monkeypatch):
+    def fail(text):
+        raise pyperclip.PyperclipException("no clipboard")
+
+    monkeypatch.setattr(pyperclip, "copy", fail)
+    monkeypatch.delenv("WAYLAND_DISPLAY", raising=False)
+    monkeypatch.delenv("XDG_SESSION_TYPE", raising=False)
+    monkeypatch.delenv("DISPLAY", raising=False)
+
+    with pytest.raises(sinks.OutputError, match="No DISPLAY"):
+        with sinks.ClipboardSink(core.ClipboardBackend("xclip")) as sink:
+            sink.write("text")
+
+
+def test_clipboard_sink_abort_discards_output(monkeypatch):
+    process = _FakeProcess()
+    monkeypatch.setattr(core.subprocess, "Popen", lambda cmd, **kwargs: process)
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("pyperclip used"))
+
+    with pytest.raises(KeyboardInterrupt):
+        with sinks.ClipboardSink(core.ClipboardBackend("xsel", "/usr/bin/xsel")) as sink:
+            sink.write("partial")
+            raise KeyboardInterrupt
+    assert process.killed
+
+
+def _run_cb(monkeypatch, tmp_path, *argv):
+    main_module = sys.modules["copybuffer.main"]
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["cb", *argv])
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("clipboard used"))
+    monkeypatch.setattr(
+        main_module, "check_dependencies", lambda *a: pytest.fail("dependencies checked")
+    )
+    main_module.main()
+
+
+def test_cli_stdout_and_output(monkeypatch, tmp_path, capfd):
+    (tmp_path / "a.txt").write_text("alpha\n")
+    (tmp_path / "b.txt").write_text("beta\n")
+
+    _run_cb(monkeypatch, tmp_path, "-i", "a.txt", "b.txt", "--stdout")
+    out, err = capfd.readouterr()
+    assert out == "=== File: a.txt ===\nalpha\n=== File: b.txt ===\nbeta\n"
+    assert "Files written to stdout successfully!" in err
+
+    _run_cb(monkeypatch, tmp_path, "a.txt", "--output", "out.txt")
+    out, err = capfd.readouterr()
+    assert (tmp_path / "out.txt").read_text() == "alpha\n"
+    assert out == "Files written to out.txt successfully!\n"
+
+
+def test_cli_output_file_is_replaced_only_on_success(monkeypatch, tmp_path, capfd):
+    (tmp_path / "keep.txt").write_text("previous output\n")
+    _run_cb(monkeypatch, tmp_path, "missing.txt", "-o", "keep.txt")
+    assert "not found" in capfd.readouterr().out
+    assert (tmp_path / "keep.txt").read_text() == "previous output\n"
+
+    (tmp_path / "a.txt").write_text("alpha\n")
+    (tmp_path / "z_out.txt").write_text("stale\n")
+    _run_cb(monkeypatch, tmp_path, "-r", ".", "-i", "-o", "z_out.txt")
+    capfd.readouterr()
+    assert (tmp_path / "z_out.txt").read_text() == (
+        "=== File: a.txt ===\nalpha\n=== File: keep.txt ===\nprevious output\n"
+    )
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.txt", "keep.txt", "z_out.txt"]
+
+
+def test_file_sink_abort_keeps_existing_file(tmp_path):
+    target = tmp_path / "out.txt"
+    target.write_text("old\n")
+    target.chmod(0o640)
+
+    with pytest.raises(RuntimeError):
+        with sinks.FileSink(target) as sink:
+            sink.write("partial")
+            raise RuntimeError("read failed")
+    assert target.read_text() == "old\n"
+    assert [path.name for path in tmp_path.iterdir()] == ["out.txt"]
+
+    with sinks.FileSink(target) as sink:
+        sink.write("new\n")
+    assert target.read_text() == "new\n"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert [path.name for path in tmp_path.iterdir()] == ["out.txt"]
+
+
+def test_cli_streams_stdin(monkeypatch, tmp_path, capfd):
+    def run(data, *argv):
+        monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+        _run_cb(monkeypatch, tmp_path, "--stdout", *argv)
+        return capfd.readouterr()
+
+    out, err = run("\n  naïve ☃ text \n\n".encode("utf-8"))
+    assert out == "naïve ☃ text\n"
+    assert "STDIN written to stdout successfully!" in err
+
+    out, err = run("\ufeffhello world".encode("utf-16-le"), "--max-total-bytes", "12")
+    assert out == "hello\n"
+    assert "STDIN truncated to its first 12 bytes" in err
+
+
+def test_cli_reports_stdin_read_errors(monkeypatch, tmp_path, capfd):
+    class FailingInput(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            raise OSError("Input/output error")
+
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BufferedReader(FailingInput())))
+    _run_cb(monkeypatch, tmp_path, "--stdout")
+    out, err = capfd.readouterr()
+    assert out == ""
+    assert "Error reading from STDIN: Input/output error" in err
@@ -0,0 +1,46 @@
+"""Startup regression checks.
+
+``cb`` runs in shell loops and editor keybindings, so importing the CLI must
+not pull in the heavy optional-path dependencies. They are imported lazily by
+the code paths that need them (tokens, images, directory discovery,
+--dedup and --paste-compressed).
+"""
+
+from pathlib import Path
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+LAZY_MODULES = {
+    "tiktoken",
+    "PIL",
+    "pathspec",
+    "sqlite3",
+    "concurrent",
+    "tarfile",
+    "gzip",
+    "hashlib",
+}
+
+
+def _imported_modules(statement):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        name = line.rsplit("|", 1)[1].strip()
+        modules.add(name.split(".")[0])
+    return modules
+
+
+def test_cli_import_does_not_load_heavy_dependencies():
+    loaded = _imported_modules("import copybuffer.main")
+    assert "copybuffer" in loaded
+    assert not (loaded & LAZY_MODULES)
@@ -0,0 +1,89 @@
+"""Token counting tests.
+
+tiktoken downloads its vocabularies on first use, so these tests build a
+small byte-level encoding with cl100k's pre-tokenizer pattern instead. Token
+boundaries only depend on that pattern, which is what the chunking and
+batching logic has to respect.
+"""
+
+from pathlib import Path
+import sys
+
+import pytest
+import tiktoken
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from copybuffer import core
+
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+SAMPLES = [
+    "",
+    "hello world",
+    "def main():\n    return 42\n\n\nclass Foo:\n    pass\n",
+    "  leading and trailing  \n\n  ",
+    "naïve café ☃ — 12345 numbers\r\nwindows lines\r\n",
+]
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    ranks = {bytes([i]): i for i in range(256)}
+    for pair in [b"th", b"he", b"in", b"er", b"an", b" t", b"re", b"on", b"  "]:
+        ranks[pair] = len(ranks)
+    enc = tiktoken.Encoding(
+        name="test_bytes",
+        pat_str=CL100K_PATTERN,
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+    monkeypatch.setattr(core, "get_tokenizer", lambda name=core.encoding: enc)
+    return enc
+
+
+@pytest.mark.parametrize("num_threads", [None, 1, 4])
+def test_count_tokens_batch_matches_encode(tokenizer, num_threads):
+    counts = core.count_tokens_batch(SAMPLES, num_threads=num_threads)
+    assert counts == [len(tokenizer.encode_ordinary(text)) for text in SAMPLES]
+
+
+def test_count_tokens_batch_empty(tokenizer):
+    assert core.count_tokens_batch([]) == []
+
+
+def _random_texts(count, length, seed=1234):
+    import random
+
+    rng = random.Random(seed)
+    alphabet = ["a", "Z", "é", "1", "42", ".", ",", "'s", " ", "  ", "\t", "\n", "\r\n", "\n\n", "  \n"]
+    return ["".join(rng.choice(alphabet) for _ in range(length)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 16, 64])
+def test_count_tokens_chunked_matches_encode(tokenizer, chunk_size):
+    for text in SAMPLES + _random_texts(40, 300):
+        expected = len(tokenizer.encode_ordinary(text))
+        assert core.count_tokens(text, chunk_size=chunk_size) == expected, repr(text)
+
+
+def test_count_tokens_without_safe_split_points(tokenizer):
+    blob = "x" * 1000 + " tail"
+    assert core.count_tokens(blob, chunk_size=10) == len(tokenizer.encode_ordinary(blob))
+
+
+def test_count_tokens_encodes_bounded_chunks(tokenizer, monkeypatch):
+    text = "word " * 10_000
+    seen = []
+    encode_ordinary = tokenizer.encode_ordinary
+
+    class Recording:
+        def encode_ordinary(self, chunk):
+            seen.append(len(chunk))
+            return encode_ordinary(chunk)
+
+    monkeypatch.setattr(core, "get_tokenizer", lambda name=core.encoding: Recording())
+    assert core.count_tokens(text, chunk_size=1000) == len(encode_ordinary(text))
+    assert max(seen) <= 1000
+    assert sum(seen) == len(text)
@@ -1,5 +1,6 @@
 from pathlib import Path
 import pyperclip
+import pytest
 import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -118,3 +119,152 @@ def test_is_xclip_and_xsel_installed(monkeypatch):
     assert core.is_xclip_installed()
     assert core.is_xsel_installed()
 
+
+
+def _counting_which(calls, available):
+    def fake_which(cmd):
+        calls.append(cmd)
+        return f"/usr/bin/{cmd}" if cmd in available else None
+
+    return fake_which
+
+
+def test_clipboard_backend_probed_once_per_process(monkeypatch):
+    calls = []
+    monkeypatch.setattr(core.shutil, "which", _counting_which(calls, {"wl-copy", "wl-paste"}))
+    monkeypatch.setattr(core.os, "access", lambda path, mode: True)
+    monkeypatch.setenv("WAYLAND_DISPLAY", "wayland-0")
+
+    backend = core.get_clipboard_backend()
+    assert backend.name == "wl-copy"
+    assert backend.missing == ()
+    assert backend.image_command("image/png") == ["wl-copy", "--type", "image/png"]
+
+    probes = len(calls)
+    assert core.get_clipboard_backend() is backend
+    assert len(calls) == probes
+
+
+def test_clipboard_backend_persisted_across_processes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(core.shutil, "which", _counting_which(calls, {"xclip"}))
+    monkeypatch.setattr(core.os, "access", lambda path, mode: True)
+    monkeypatch.setattr(core, "is_wayland", lambda: False)
+    monkeypatch.setenv("DISPLAY", ":1")
+
+    assert core.get_clipboard_backend().name == "xclip"
+
+    # A new process starts without the in-memory backend but reuses the file.
+    monkeypatch.setattr(core, "_CLIPBOARD_BACKEND", None)
+    calls.clear()
+    assert core.get_clipboard_backend().name == "xclip"
+    assert calls == []
+
+    # Changing PATH invalidates the cached probe.
+    monkeypatch.setattr(core, "_CLIPBOARD_BACKEND", None)
+    monkeypatch.setenv("PATH", "/somewhere/else")
+    assert core.get_clipboard_backend().name == "xclip"
+    assert calls
+
+
+def test_incomplete_clipboard_backend_not_persisted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(core.shutil, "which", _counting_which(calls, set()))
+    monkeypatch.setattr(core, "is_wayland", lambda: False)
+    monkeypatch.setenv("DISPLAY", ":1")
+
+    backend = core.get_clipboard_backend()
+    assert backend.name is None
+    assert backend.missing == ("xclip or xsel",)
+    assert core.check_dependencies(backend) == ["xclip or xsel"]
+
+    monkeypatch.setattr(core, "_CLIPBOARD_BACKEND", None)
+    calls.clear()
+    core.get_clipboard_backend()
+    assert calls
+
+
+class _FakeProcess:
+    def __init__(self, returncode=0):
+        self.returncode = returncode
+        self.chunks = []
+        self.closed = False
+        self.stdin = self
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def close(self):
+        self.closed = True
+
+    def wait(self):
+        return self.returncode
+
+
+def test_copy_text_streams_into_backend(monkeypatch):
+    launched = {}
+    process = _FakeProcess()
+
+    def fake_popen(cmd, **kwargs):
+        launched["cmd"] = cmd
+        launched["kwargs"] = kwargs
+        return process
+
+    monkeypatch.setattr(core.subprocess, "Popen", fake_popen)
+    monkeypatch.setattr(core, "_CLIPBOARD_CHUNK_CHARS", 4)
+    monkeypatch.setattr(pyperclip, "copy", lambda text: pytest.fail("pyperclip used"))
+
+    backend = core.ClipboardBackend("xclip", "/usr/bin/xclip")
+    core.copy_text_to_clipboard("héllo wörld", backend)
+
+    assert launched["cmd"] == ["xclip", "-selection", "clipboard", "-i"]
+    assert launched["kwargs"]["stdin"] == core.subprocess.PIPE
+    assert b"".join(process.chunks) == "héllo wörld".encode("utf-8")
+    assert len(process.chunks) == 3
+    assert process.closed
+
+
+@pytest.mark.parametrize(
+    "popen",
+    [
+        lambda cmd, **kwargs: _FakeProcess(returncode=1),
+        lambda cmd, **kwargs: (_ for _ in ()).throw(FileNotFoundError(cmd[0])),
+    ],
+)
+def test_copy_text_falls_back_to_pyperclip(monkeypatch, popen):
+    captured = []
+    monkeypatch.setattr(core.subprocess, "Popen", popen)
+    monkeypatch.setattr(pyperclip, "copy", captured.append)
+
+    core.copy_text_to_clipboard("data", core.ClipboardBackend("wl-copy", "/usr/bin/wl-copy"))
+    core.copy_text_to_clipboard("win", core.ClipboardBackend("win32"))
+
+    assert captured == ["data", "win"]
+
+
+def test_copy_file_contents_layout(monkeypatch):
+    captured = []
+    monkeypatch.setattr(pyperclip, "copy", captured.append)
+
+    result = core.copy_file_contents_to_clipboard(
+        ["one", "two"],
+        include_header=True,
+        discord_attachment=True,
+        file_paths=["a.txt", "b.txt"],
+    )
+
+    expected = (
+        "[Attached file: a.txt\nContent:\n```\n=== File: a.txt ===\none\n```\n]\n"
+        "[Attached file: b.txt\nContent:\n```\n=== File: b.txt ===\ntwo\n```\n]\n"
+    )
+    assert result == expected
+    assert captured == [expected]
+    assert core.copy_file_contents_to_clipboard(["x", "y"]) == "x\ny\n"
+
+
+def test_copy_file_contents_debug_prints_deltas(monkeypatch, capsys):
+    monkeypatch.setattr(pyperclip, "copy", lambda text: None)
+    core.copy_file_contents_to_clipboard(["first", "second"], debug=True)
+    out = capsys.readouterr().out
+    assert out.count("first") == 2  # its own delta plus the final dump
+    assert out.count("second") == 2